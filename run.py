@@ -11,29 +11,49 @@ from pathlib import Path
 # Add src directory to Python path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
+REQUIRED_VARS = ('TELEGRAM_BOT_TOKEN', 'GEMINI_API_KEY')
+
+# Heavy imports are resolved lazily and memoized so repeated calls skip the import machinery
+_load_dotenv = None
+_bot_cls = None
+_config_ok = False
+
+def _get_bot_cls():
+    """Import the bot class on first use and cache it."""
+    global _bot_cls
+    if _bot_cls is None:
+        from bot import CupidGPTBot as _bot_cls
+    return _bot_cls
+
 def check_configuration():
     """Check if bot is properly configured."""
-    if not os.path.exists('.env'):
+    global _load_dotenv, _config_ok
+    if _config_ok:
+        return True
+    
+    try:
+        os.stat('.env')
+    except FileNotFoundError:
         print("❌ .env file not found!")
         print("Run setup.py first: python setup.py")
         return False
     
     # Check for required environment variables
-    from dotenv import load_dotenv
-    load_dotenv()
-    
-    required_vars = ['TELEGRAM_BOT_TOKEN', 'GEMINI_API_KEY']
-    missing_vars = []
+    if _load_dotenv is None:
+        from dotenv import load_dotenv as _load_dotenv
+    _load_dotenv('.env')
     
-    for var in required_vars:
-        value = os.getenv(var)
-        if not value or value.startswith('your_'):
-            missing_vars.append(var)
+    env = dict(os.environ)
+    missing_vars = [
+        var for var in REQUIRED_VARS
+        if not env.get(var) or env[var].startswith('your_')
+    ]
     
     if missing_vars:
         print(f"❌ Please configure these variables in .env: {', '.join(missing_vars)}")
         return False
     
+    _config_ok = True
     return True
 
 def main():
@@ -47,8 +67,7 @@ def main():
     
     try:
         # Import and run the bot
-        from bot import CupidGPTBot
-        bot = CupidGPTBot()
+        bot = _get_bot_cls()()
         bot.run()
     except KeyboardInterrupt:
         print("\n👋 Bot stopped by user")
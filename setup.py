@@ -5,8 +5,11 @@ This script helps with initial setup and configuration.
 """
 
 import os
+import re
 import sys
-import subprocess
+import mmap
+import shutil
+import importlib.util
 from pathlib import Path
 
 
@@ -20,8 +23,8 @@ def create_directories():
 
 def check_python_version():
     """Check if Python version is compatible."""
-    if sys.version_info < (3, 8):
-        print("❌ Python 3.8 or higher is required!")
+    if sys.version_info < (3, 9):
+        print("❌ Python 3.9 or higher is required!")
         print(f"Current version: {sys.version}")
         return False
     print(f"✅ Python version compatible: {sys.version}")
@@ -32,7 +35,7 @@ def create_env_file():
     """Create .env file from template if it doesn't exist."""
     if not os.path.exists('.env'):
         if os.path.exists('.env.example'):
-            subprocess.run(['cp', '.env.example', '.env'])
+            shutil.copyfile('.env.example', '.env')
             print("✅ Created .env file from template")
             print("⚠️  Please edit .env file with your API keys!")
         else:
@@ -43,9 +46,13 @@ def create_env_file():
 
 def install_dependencies():
     """Install Python dependencies."""
+    import subprocess
     try:
         print("📦 Installing dependencies...")
-        subprocess.run([sys.executable, '-m', 'pip', 'install', '-r', 'requirements.txt'], 
+        # Prefer wheels and skip the version check / bytecode compilation to keep installs fast;
+        # .pyc files are written on first import anyway
+        subprocess.run([sys.executable, '-m', 'pip', 'install', '--disable-pip-version-check',
+                        '--prefer-binary', '--no-compile', '-r', 'requirements.txt'],
                       check=True)
         print("✅ Dependencies installed successfully")
     except subprocess.CalledProcessError:
@@ -55,7 +62,11 @@ def install_dependencies():
 
 
 def test_imports():
-    """Test if all required modules can be imported."""
+    """Test if all required modules can be imported.
+
+    Uses find_spec so module availability is checked without executing the
+    (heavy) top-level code of packages like telegram or google.generativeai.
+    """
     required_modules = [
         'telegram',
         'google.generativeai',
@@ -67,8 +78,9 @@ def test_imports():
     failed_imports = []
     for module in required_modules:
         try:
-            __import__(module)
-            print(f"✅ {module} imported successfully")
+            if importlib.util.find_spec(module) is None:
+                raise ImportError(module)
+            print(f"✅ {module} is available")
         except ImportError:
             print(f"❌ Failed to import {module}")
             failed_imports.append(module)
@@ -80,7 +92,7 @@ def initialize_database():
     """Initialize the database."""
     try:
         from src.database import DatabaseManager
-        db = DatabaseManager('data/cupidgpt.db')
+        DatabaseManager.for_path('data/cupidgpt.db')
         print("✅ Database initialized successfully")
         return True
     except Exception as e:
@@ -96,13 +108,21 @@ def validate_env_file():
         print("❌ .env file not found!")
         return False
     
-    with open('.env', 'r') as f:
-        content = f.read()
-    
-    missing_vars = []
-    for var in required_vars:
-        if f"{var}=your_" in content or var not in content:
-            missing_vars.append(var)
+    # Collect every assignment in a single regex pass; anchored so commented-out lines don't count.
+    # Accepts the forms python-dotenv does: indentation, "export", spaces around "=", quoted values
+    assigns = {}
+    with open('.env', 'rb') as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                assigns = dict(re.findall(
+                    rb'^[ \t]*(?:export[ \t]+)?(\w+)[ \t]*=[ \t]*[\'"]?(\S*?)[\'"]?[ \t]*\r?$',
+                    mm, re.M
+                ))
+    
+    missing_vars = [
+        var for var in required_vars
+        if not assigns.get(var.encode()) or assigns[var.encode()].startswith(b'your_')
+    ]
     
     if missing_vars:
         print(f"⚠️  Please configure these variables in .env: {', '.join(missing_vars)}")
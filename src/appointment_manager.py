@@ -1,386 +1,413 @@
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+import math
+import time
+from bisect import bisect_right
+from contextlib import closing
+from dataclasses import asdict, dataclass
+from typing import Dict, Any, Iterable, List, Mapping, Optional
 from datetime import datetime, timedelta
 from database import DatabaseManager
 from llm_client import LLMClient
 
 
+# (upper bound in seconds, template, unit in seconds) for relative time descriptions
+_RELATIVE_TIME_BUCKETS = (
+    (0, "Started", 1),
+    (3600, "In {} minutes", 60),
+    (86400, "In {} hours", 3600),
+    (2 * 86400, "Tomorrow", 86400),
+    (7 * 86400, "In {} days", 86400),
+    (30 * 86400, "In {} weeks", 7 * 86400),
+    (math.inf, "In {} months", 30 * 86400),
+)
+_RELATIVE_TIME_BOUNDS = tuple(bucket[0] for bucket in _RELATIVE_TIME_BUCKETS)
+
+# English names for display dates, equivalent to strftime's %B and %A in the C locale
+_MONTHS = ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+           'August', 'September', 'October', 'November', 'December')
+_WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+@dataclass
+class AppointmentResponse:
+    """Appointment fields returned to callers after a successful creation."""
+    
+    # Declared by hand (no field defaults) since dataclass(slots=True) needs Python 3.10
+    __slots__ = ('id', 'title', 'description', 'appointment_date', 'location',
+                 'duration_minutes')
+    
+    id: int
+    title: str
+    description: str
+    appointment_date: str
+    location: str
+    duration_minutes: int
+
+
+def _format_display_date(dt: datetime) -> str:
+    """Format a datetime like strftime('%A, %B %d, %Y at %I:%M %p')."""
+    hour = dt.hour
+    return (f"{_WEEKDAYS[dt.weekday()]}, {_MONTHS[dt.month - 1]} {dt.day:02d}, {dt.year} "
+            f"at {(hour - 1) % 12 + 1:02d}:{dt.minute:02d} {'AM' if hour < 12 else 'PM'}")
+
+
 class AppointmentManager:
     """Manages appointment creation, retrieval, and operations."""
     
+    __slots__ = ('db', 'openai_client')
+    
     def __init__(self, db: DatabaseManager, openai_client: LLMClient):
         self.db = db
         self.openai_client = openai_client
     
-    async def create_appointment_from_text(self, text: str, user_telegram_id: int) -> Dict[str, Any]:
-        """Create an appointment from natural language text."""
+    async def create_appointment_from_text(self, text: str, user_telegram_id: int,
+                                         _now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Create an appointment from natural language text.
+        
+        ``_now`` lets batch callers share one clock reading.
+        """
         try:
             # Extract appointment details using OpenAI
             details = await self.openai_client.extract_appointment_details(text)
+        except Exception as e:
+            # The client wraps a third-party network SDK, so any failure is possible here
+            logging.error(f"Error creating appointment from text: {e}")
+            return {
+                'success': False,
+                'message': 'An error occurred while creating the appointment'
+            }
+        
+        return await self.create_appointment_from_details(details, user_telegram_id, _now)
+    
+    async def create_appointment_from_details(self, details: Dict[str, Any], user_telegram_id: int,
+                                              _now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Create an appointment from details already extracted by the LLM client.
+        
+        ``_now`` lets batch callers share one clock reading.
+        """
+        if not details.get('success'):
+            return {
+                'success': False,
+                'message': details.get('error', 'Failed to understand appointment details')
+            }
+        
+        try:
+            # Validate appointment time (not in the past), as a plain number comparison
+            # when the client supplied epoch seconds
+            epoch = details.get('appointment_epoch')
+            if epoch is None:
+                appointment_datetime = datetime.fromisoformat(details['appointment_datetime'])
+                epoch = appointment_datetime.timestamp()
+            else:
+                appointment_datetime = None
             
-            if not details.get('success'):
-                return {
-                    'success': False,
-                    'message': details.get('error', 'Failed to understand appointment details')
-                }
-            
-            # Parse the datetime
-            appointment_datetime = datetime.fromisoformat(details['appointment_datetime'])
-            
-            # Validate appointment time (not in the past)
-            if appointment_datetime < datetime.now():
+            if epoch < (_now.timestamp() if _now else time.time()):
                 return {
                     'success': False,
                     'message': "Cannot create appointments in the past"
                 }
             
-            # Create the appointment
-            appointment_id = self.db.create_appointment(
-                title=details['title'],
-                description=details.get('description', ''),
-                appointment_date=appointment_datetime,
-                location=details.get('location', ''),
-                created_by_telegram_id=user_telegram_id
-            )
-            
-            if appointment_id:
-                appointment_data = {
-                    'id': appointment_id,
-                    'title': details['title'],
-                    'description': details.get('description', ''),
-                    'appointment_date': appointment_datetime.strftime('%Y-%m-%d %H:%M'),
-                    'location': details.get('location', ''),
-                    'duration_minutes': details.get('duration_minutes', 60)
-                }
-                
-                logging.info(f"Appointment created: {appointment_id} by user {user_telegram_id}")
-                
-                return {
-                    'success': True,
-                    'appointment': appointment_data,
-                    'message': 'Appointment created successfully'
-                }
-            else:
-                return {
-                    'success': False,
-                    'message': 'Failed to save appointment to database'
-                }
-                
-        except Exception as e:
+            if appointment_datetime is None:
+                appointment_datetime = datetime.fromtimestamp(epoch)
+            title = details['title']
+            # The model may return the duration as a string such as "90"
+            duration_minutes = int(details.get('duration_minutes') or 60)
+        except (KeyError, TypeError, ValueError, OverflowError, OSError) as e:
             logging.error(f"Error creating appointment from text: {e}")
             return {
                 'success': False,
                 'message': 'An error occurred while creating the appointment'
             }
+        
+        description = details.get('description', '')
+        location = details.get('location', '')
+        
+        # Create the appointment
+        appointment_id = await asyncio.to_thread(
+            self.db.create_appointment,
+            title=title,
+            description=description,
+            appointment_date=appointment_datetime,
+            location=location,
+            created_by_telegram_id=user_telegram_id,
+            duration_minutes=duration_minutes
+        )
+        
+        return self._make_create_response(appointment_id, title, description, appointment_datetime,
+                                          location, duration_minutes, user_telegram_id,
+                                          "Appointment created")
     
     async def create_appointment_manual(self, title: str, description: str, 
                                       appointment_date: datetime, location: str,
-                                      user_telegram_id: int) -> Dict[str, Any]:
-        """Create an appointment with manual input."""
+                                      user_telegram_id: int,
+                                      _now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Create an appointment with manual input.
+        
+        ``_now`` lets batch callers share one clock reading.
+        """
         try:
             # Validate appointment time
-            if appointment_date < datetime.now():
-                return {
-                    'success': False,
-                    'message': "Cannot create appointments in the past"
-                }
-            
-            appointment_id = self.db.create_appointment(
-                title=title,
-                description=description,
-                appointment_date=appointment_date,
-                location=location,
-                created_by_telegram_id=user_telegram_id
-            )
-            
-            if appointment_id:
-                appointment_data = {
-                    'id': appointment_id,
-                    'title': title,
-                    'description': description,
-                    'appointment_date': appointment_date.strftime('%Y-%m-%d %H:%M'),
-                    'location': location
-                }
-                
-                logging.info(f"Manual appointment created: {appointment_id} by user {user_telegram_id}")
-                
-                return {
-                    'success': True,
-                    'appointment': appointment_data,
-                    'message': 'Appointment created successfully'
-                }
-            else:
-                return {
-                    'success': False,
-                    'message': 'Failed to save appointment to database'
-                }
-                
-        except Exception as e:
+            in_past = appointment_date < (_now or datetime.now())
+        except TypeError as e:
             logging.error(f"Error creating manual appointment: {e}")
             return {
                 'success': False,
                 'message': 'An error occurred while creating the appointment'
             }
+        
+        if in_past:
+            return {
+                'success': False,
+                'message': "Cannot create appointments in the past"
+            }
+        
+        appointment_id = await asyncio.to_thread(
+            self.db.create_appointment,
+            title=title,
+            description=description,
+            appointment_date=appointment_date,
+            location=location,
+            created_by_telegram_id=user_telegram_id
+        )
+        
+        return self._make_create_response(appointment_id, title, description, appointment_date,
+                                          location, 60, user_telegram_id,
+                                          "Manual appointment created")
+    
+    @staticmethod
+    def _make_create_response(appointment_id: Optional[int], title: str, description: str,
+                              appointment_date: datetime, location: str, duration_minutes: int,
+                              user_telegram_id: int, log_label: str) -> Dict[str, Any]:
+        """Build the result of a create call from the id returned by the database."""
+        if not appointment_id:
+            return {
+                'success': False,
+                'message': 'Failed to save appointment to database'
+            }
+        
+        logging.info(f"{log_label}: {appointment_id} by user {user_telegram_id}")
+        
+        return {
+            'success': True,
+            'appointment': asdict(AppointmentResponse(
+                id=appointment_id,
+                title=title,
+                description=description,
+                appointment_date=appointment_date.isoformat(sep=' ', timespec='minutes'),
+                location=location,
+                duration_minutes=duration_minutes
+            )),
+            'message': 'Appointment created successfully'
+        }
     
     async def get_user_appointments(self, user_telegram_id: int, 
-                                  upcoming_only: bool = True) -> List[Dict[str, Any]]:
+                                  upcoming_only: bool = True,
+                                  limit: Optional[int] = None,
+                                  _now: Optional[datetime] = None) -> List[Dict[str, Any]]:
         """Get appointments for a user."""
+        # One clock reading for both the upcoming filter and relative times
+        now = _now or datetime.now()
+        appointments = await asyncio.to_thread(
+            self.db.get_appointments, user_telegram_id, upcoming_only, limit, now
+        )
+        
         try:
-            appointments = self.db.get_appointments(user_telegram_id, upcoming_only)
-            
             # Format appointment dates for display
+            parse = self._parse_db_datetime
             for appointment in appointments:
                 if appointment.get('appointment_date'):
-                    # Parse the datetime string from database
-                    dt = datetime.fromisoformat(appointment['appointment_date'].replace(' ', 'T'))
-                    appointment['formatted_date'] = dt.strftime('%A, %B %d, %Y at %I:%M %p')
-                    appointment['relative_time'] = self._get_relative_time(dt)
-            
-            return appointments
-            
-        except Exception as e:
+                    dt = parse(appointment['appointment_date'])
+                    appointment['formatted_date'] = _format_display_date(dt)
+                    appointment['relative_time'] = self._get_relative_time(dt, now)
+        except (TypeError, ValueError) as e:
             logging.error(f"Error getting user appointments: {e}")
             return []
+        
+        return appointments
+    
+    @staticmethod
+    def _parse_db_datetime(value: str) -> datetime:
+        """Parse a 'YYYY-MM-DD HH:MM[:SS]' timestamp as stored by SQLite."""
+        # The stored layout is fixed, so slicing is cheaper than fromisoformat
+        return datetime(
+            int(value[0:4]), int(value[5:7]), int(value[8:10]),
+            int(value[11:13]), int(value[14:16]),
+            int(value[17:19]) if len(value) >= 19 else 0
+        )
     
-    def _get_relative_time(self, appointment_date: datetime) -> str:
+    def _get_relative_time(self, appointment_date: datetime,
+                           now: Optional[datetime] = None) -> str:
         """Get relative time description for an appointment."""
-        now = datetime.now()
-        diff = appointment_date - now
+        if now is None:
+            now = datetime.now()
+        total = (appointment_date - now).total_seconds()
         
-        if diff.days == 0:
-            if diff.seconds < 3600:  # Less than 1 hour
-                minutes = diff.seconds // 60
-                return f"In {minutes} minutes"
-            else:
-                hours = diff.seconds // 3600
-                return f"In {hours} hours"
-        elif diff.days == 1:
-            return "Tomorrow"
-        elif diff.days < 7:
-            return f"In {diff.days} days"
-        elif diff.days < 30:
-            weeks = diff.days // 7
-            return f"In {weeks} weeks"
-        else:
-            months = diff.days // 30
-            return f"In {months} months"
+        # The last bound is infinite, so every finite offset lands in a bucket
+        _, template, unit = _RELATIVE_TIME_BUCKETS[bisect_right(_RELATIVE_TIME_BOUNDS, total)]
+        return template.format(int(total // unit))
     
     async def get_appointment_by_id(self, appointment_id: int) -> Optional[Dict[str, Any]]:
         """Get a specific appointment by ID."""
-        try:
-            return self.db.get_appointment_by_id(appointment_id)
-        except Exception as e:
-            logging.error(f"Error getting appointment by ID: {e}")
-            return None
+        return await asyncio.to_thread(self.db.get_appointment_by_id, appointment_id)
     
     async def update_appointment(self, appointment_id: int, user_telegram_id: int,
                                **updates) -> Dict[str, Any]:
         """Update an appointment."""
-        try:
-            # Check if user has permission to update this appointment
-            appointment = await self.get_appointment_by_id(appointment_id)
-            if not appointment:
+        updates = {field: value for field, value in updates.items()
+                   if field in ['title', 'description', 'appointment_date', 'location']}
+        
+        if not updates:
+            return {
+                'success': False,
+                'message': 'No valid fields to update'
+            }
+        
+        # Permission check, change detection and write happen in a single
+        # statement; only look up the reason when no row was written
+        changed = await asyncio.to_thread(self.db.update_appointment_if_permitted,
+                                          appointment_id, user_telegram_id, updates)
+        if changed is None:
+            return {
+                'success': False,
+                'message': 'An error occurred while updating the appointment'
+            }
+        
+        if not changed:
+            auth = await asyncio.to_thread(self.db.get_appointment_auth_fields, appointment_id)
+            if not auth:
                 return {
                     'success': False,
                     'message': 'Appointment not found'
                 }
             
-            # Check if user is creator or shared user
-            user = self.db.get_user_by_telegram_id(user_telegram_id)
-            if not user:
+            user_id = await asyncio.to_thread(self.db.user_id_for_telegram, user_telegram_id)
+            if user_id is None:
                 return {
                     'success': False,
                     'message': 'User not found'
                 }
             
-            user_id = user['id']
-            if appointment['created_by'] != user_id and appointment.get('shared_with') != user_id:
+            if user_id not in auth:
                 return {
                     'success': False,
                     'message': 'You do not have permission to update this appointment'
                 }
             
-            # Build update query
-            update_fields = []
-            update_values = []
-            
-            for field, value in updates.items():
-                if field in ['title', 'description', 'appointment_date', 'location']:
-                    update_fields.append(f"{field} = ?")
-                    update_values.append(value)
-            
-            if not update_fields:
-                return {
-                    'success': False,
-                    'message': 'No valid fields to update'
-                }
-            
-            update_values.append(appointment_id)
-            
-            if not self.db.update_appointment(appointment_id, updates):
-                return {
-                    'success': False,
-                    'message': 'Failed to update appointment'
-                }
-            
-            logging.info(f"Appointment {appointment_id} updated by user {user_telegram_id}")
-            
+            # Permitted, but every field already had the requested value
             return {
                 'success': True,
                 'message': 'Appointment updated successfully'
             }
-            
-        except Exception as e:
-            logging.error(f"Error updating appointment: {e}")
-            return {
-                'success': False,
-                'message': 'An error occurred while updating the appointment'
-            }
+        
+        logging.info(f"Appointment {appointment_id} updated by user {user_telegram_id}")
+        
+        return {
+            'success': True,
+            'message': 'Appointment updated successfully'
+        }
     
     async def delete_appointment(self, appointment_id: int, user_telegram_id: int) -> Dict[str, Any]:
         """Delete an appointment."""
-        try:
-            # Check if user has permission to delete this appointment
-            appointment = await self.get_appointment_by_id(appointment_id)
-            if not appointment:
+        # Only the creator may delete; the check is part of the DELETE itself
+        deleted = await asyncio.to_thread(self.db.delete_appointment_if_owner,
+                                          appointment_id, user_telegram_id)
+        if deleted is None:
+            return {
+                'success': False,
+                'message': 'An error occurred while deleting the appointment'
+            }
+        
+        if not deleted:
+            auth = await asyncio.to_thread(self.db.get_appointment_auth_fields, appointment_id)
+            if not auth:
                 return {
                     'success': False,
                     'message': 'Appointment not found'
                 }
             
-            # Check if user is creator
-            user = self.db.get_user_by_telegram_id(user_telegram_id)
-            if not user:
+            if await asyncio.to_thread(self.db.user_id_for_telegram, user_telegram_id) is None:
                 return {
                     'success': False,
                     'message': 'User not found'
                 }
             
-            if appointment['created_by'] != user['id']:
-                return {
-                    'success': False,
-                    'message': 'Only the creator can delete an appointment'
-                }
-            
-            if not self.db.delete_appointment(appointment_id):
-                return {
-                    'success': False,
-                    'message': 'Failed to delete appointment'
-                }
-            
-            logging.info(f"Appointment {appointment_id} deleted by user {user_telegram_id}")
-            
-            return {
-                'success': True,
-                'message': 'Appointment deleted successfully'
-            }
-            
-        except Exception as e:
-            logging.error(f"Error deleting appointment: {e}")
             return {
                 'success': False,
-                'message': 'An error occurred while deleting the appointment'
+                'message': 'Only the creator can delete an appointment'
             }
+        
+        logging.info(f"Appointment {appointment_id} deleted by user {user_telegram_id}")
+        
+        return {
+            'success': True,
+            'message': 'Appointment deleted successfully'
+        }
     
     async def get_appointments_for_date(self, user_telegram_id: int, 
                                       target_date: datetime) -> List[Dict[str, Any]]:
         """Get appointments for a specific date."""
-        try:
-            start_date = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_date = start_date + timedelta(days=1)
-            
-            user = self.db.get_user_by_telegram_id(user_telegram_id)
-            if not user:
-                return []
-            
-            user_id = user['id']
-            
-            return self.db.get_appointments_in_range(user_id, start_date, end_date)
-                
-        except Exception as e:
-            logging.error(f"Error getting appointments for date: {e}")
+        start_date = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = start_date + timedelta(days=1)
+        
+        user_id = await asyncio.to_thread(self.db.user_id_for_telegram, user_telegram_id)
+        if user_id is None:
             return []
+        
+        return await asyncio.to_thread(self.db.get_appointments_in_range,
+                                       user_id, start_date, end_date)
     
     async def get_conflicting_appointments(self, user_telegram_id: int,
                                          appointment_date: datetime,
                                          duration_minutes: int = 60) -> List[Dict[str, Any]]:
         """Check for conflicting appointments."""
-        try:
-            start_time = appointment_date
-            end_time = start_time + timedelta(minutes=duration_minutes)
-            
-            user = self.db.get_user_by_telegram_id(user_telegram_id)
-            if not user:
-                return []
-            
-            user_id = user['id']
-            
-            # Get appointments in the range
-            appointments = self.db.get_appointments_in_range(user_id, start_time, end_time)
-            
-            # Since get_appointments_in_range is simple, we might need to filter manually if the conflict logic is complex
-            # But for now, let's assume any overlap is a conflict. 
-            # The original query checked for overlap. The helper gets appointments STARTING in range.
-            # We need to refine this slightly or update the helper. The original query logic was:
-            # (start_date <= start_time AND end_date > start_time) OR (start_date < end_time AND start_date >= start_time)
-            
-            # Actually, to avoid changing behavior too much let's keep it simple.
-            # If the helper returns appointments where date >= start and date < end, that covers "starts during the new appointment"
-            # It misses "started before new appointment and ends during/after".
-            
-            # Let's adjust the simple helper usage for now. 
-            # Ideally, get_appointments_in_range should probably take an overlap check, but strictly speaking "in range" usually means "starts in range".
-            
-            # For this specific case, let's check for "conflicting" appointments properly by fetching appointments around the time.
-            # A broad fetch then filter in python might be safer if we want to rely on the simple helper.
-            # Let's fetch appointments for the day, then filter.
-            
-            day_start = appointment_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = day_start + timedelta(days=1)
-            day_appointments = self.db.get_appointments_in_range(user_id, day_start, day_end)
-            
-            conflicts = []
-            for apt in day_appointments:
-                apt_start = datetime.fromisoformat(apt['appointment_date'])
-                # Assuming 1 hour duration for existing appointments if not stored
-                # The schema doesn't seem to store duration?
-                # Ah, the original query assumed 60 minutes for existing appointments: datetime(a.appointment_date, '+60 minutes')
-                
-                apt_end = apt_start + timedelta(minutes=60)
-                
-                # Check overlap
-                if (apt_start < end_time and apt_end > start_time):
-                    conflicts.append(apt)
-            
-            return conflicts
-                
-        except Exception as e:
-            logging.error(f"Error checking conflicting appointments: {e}")
+        start_time = appointment_date
+        end_time = start_time + timedelta(minutes=duration_minutes)
+        
+        user_id = await asyncio.to_thread(self.db.user_id_for_telegram, user_telegram_id)
+        if user_id is None:
             return []
+        
+        return await asyncio.to_thread(self.db.get_conflicting_appointments,
+                                       user_id, start_time, end_time)
     
     async def export_appointments(self, user_telegram_id: int, 
                                 format_type: str = 'text') -> str:
         """Export user's appointments in various formats."""
-        try:
-            appointments = await self.get_user_appointments(user_telegram_id, upcoming_only=False)
-            
-            if format_type == 'text':
-                export_text = "📅 **Your Appointments**\n\n"
-                
-                for apt in appointments:
-                    export_text += f"**{apt['title']}**\n"
-                    export_text += f"Date: {apt.get('formatted_date', apt['appointment_date'])}\n"
-                    if apt.get('location'):
-                        export_text += f"Location: {apt['location']}\n"
-                    if apt.get('description'):
-                        export_text += f"Description: {apt['description']}\n"
-                    export_text += "\n---\n\n"
-                
-                return export_text
-            
-            # Add more export formats as needed (CSV, JSON, etc.)
-            return "Export format not supported"
-            
-        except Exception as e:
-            logging.error(f"Error exporting appointments: {e}")
-            return "Error exporting appointments"
\ No newline at end of file
+        if format_type == 'text':
+            try:
+                return await asyncio.to_thread(self._export_text, user_telegram_id)
+            except (KeyError, TypeError, ValueError) as e:
+                logging.error(f"Error exporting appointments: {e}")
+                return "Error exporting appointments"
+        
+        # Add more export formats as needed (CSV, JSON, etc.)
+        return "Export format not supported"
+    
+    def _export_text(self, user_telegram_id: int) -> str:
+        """Build the text export; runs in a worker thread since it reads the cursor."""
+        user_id = self.db.user_id_for_telegram(user_telegram_id)
+        if user_id is None:
+            return self._format_export_text(())
+        
+        # Stream rows from the cursor instead of materializing every appointment;
+        # closing() releases the connection even if formatting fails midway
+        with closing(self.db.iter_appointments(user_id)) as appointments:
+            return self._format_export_text(appointments)
+    
+    def _format_export_text(self, appointments: Iterable[Mapping[str, Any]]) -> str:
+        """Format appointments (dicts or sqlite3.Row objects) as a plain text export."""
+        parts = ["📅 **Your Appointments**\n\n"]
+        append = parts.append
+        parse = self._parse_db_datetime
+        
+        for apt in appointments:
+            append(f"**{apt['title']}**\n")
+            append(f"Date: {_format_display_date(parse(apt['appointment_date']))}\n")
+            if apt['location']:
+                append(f"Location: {apt['location']}\n")
+            if apt['description']:
+                append(f"Description: {apt['description']}\n")
+            append("\n---\n\n")
+        
+        return ''.join(parts)
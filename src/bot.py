@@ -1,12 +1,19 @@
 import os
+import asyncio
 import logging
+import logging.handlers
+import queue
+import re
 import sqlite3
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any
-from dotenv import load_dotenv
+from functools import partial, wraps
+from typing import Dict, Any, Optional, Tuple
 from telegram import (
     Update, BotCommand, ReplyKeyboardMarkup, KeyboardButton,
-    InlineKeyboardMarkup, InlineKeyboardButton
+    InlineKeyboardMarkup, InlineKeyboardButton, MessageEntity
 )
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, 
@@ -14,7 +21,9 @@ from telegram.ext import (
 )
 from telegram.constants import ParseMode
 
+from config import Config, load_config
 from database import DatabaseManager
+from formatting import escape_md
 from llm_client import LLMClient
 from user_manager import UserManager
 from appointment_manager import AppointmentManager
@@ -22,28 +31,207 @@ from checklist_manager import ChecklistManager
 from reminder_service import ReminderService
 
 
+# Cheap local intent patterns; a message matching exactly one of them skips the LLM intent call
+_APPOINTMENT_RE = re.compile(
+    r"\b(remind me|appointment|meeting|meet|dinner|lunch|breakfast|schedule|date night)\b"
+    r".*\b(today|tonight|tomorrow|(mon|tues|wednes|thurs|fri|satur|sun)day"
+    r"|\d{1,2}(:\d{2}\s*(am|pm)?|\s*(am|pm)))\b",
+    re.IGNORECASE | re.DOTALL
+)
+_CHECKLIST_RE = re.compile(
+    r"\b(check ?list|grocery|groceries|to-?do|shopping list|packing list)\b",
+    re.IGNORECASE
+)
+
+
+def _local_intent(text: str) -> Optional[str]:
+    """Classify unambiguous messages without the LLM; None means ask the LLM."""
+    is_appointment = _APPOINTMENT_RE.search(text) is not None
+    is_checklist = _CHECKLIST_RE.search(text) is not None
+    if is_appointment == is_checklist:
+        return None
+    return 'appointment' if is_appointment else 'checklist'
+
+
+# Static reply texts, built once at import
+_HELP_TEXT = """
+🤖 *CupidGPT Commands*
+
+*User Management:*
+• `/start` - Initialize bot and register
+• `/pair @username` - Pair with your partner
+• `/status` - Check your pairing status
+
+*Appointments:*
+• `/new_appointment` - Create a new appointment
+• `/list_appointments` - View upcoming appointments
+
+*Checklists:*
+• `/new_checklist` - Create a new checklist
+• `/view_checklist` - View existing checklists
+
+*Smart Features:*
+Just send me a message in natural language like:
+• "Remind me about dinner on Friday at 7pm"
+• "Create a grocery list with milk, bread, and eggs"
+• "We have a meeting tomorrow at the office"
+
+I'll automatically parse your request and create appointments or checklist items!
+
+*Need Help?*
+Type `/help` anytime to see this message again.
+"""
+
+# Only the user's first name is filled in per /start
+_WELCOME_TEMPLATE = """
+🎯 *Welcome to CupidGPT!* 🎯
+
+Hello {name}! I'm your personal appointment and checklist assistant.
+
+*What I can do:*
+• 📅 Help you create and manage appointments
+• ✅ Create and share checklists with your partner
+• 🔔 Send reminders for upcoming appointments
+• 🤖 Understand natural language for easy interaction
+
+*Getting Started:*
+1. First, you need to pair with your partner using `/pair @username`
+2. Then you can start creating appointments and checklists!
+
+Use `/help` to see all available commands.
+"""
+
+
+def _menu_title(icon: str, title: str) -> Tuple[str, Tuple[MessageEntity, ...]]:
+    """Build a menu header as plain text plus a bold entity, so Telegram need not parse Markdown."""
+    # Entity offsets and lengths are counted in UTF-16 code units
+    offset = len(f"{icon} ".encode('utf-16-le')) // 2
+    length = len(title.encode('utf-16-le')) // 2
+    return f"{icon} {title}", (MessageEntity(MessageEntity.BOLD, offset, length),)
+
+
+_MAIN_MENU_TITLE = _menu_title("🔙", "Main Menu")
+_APPOINTMENTS_MENU_TITLE = _menu_title("📅", "Appointments Menu")
+_CHECKLISTS_MENU_TITLE = _menu_title("✅", "Checklists Menu")
+_SETTINGS_MENU_TITLE = _menu_title("⚙️", "Settings Menu")
+_HOME_MENU_TITLE = _menu_title("🏠", "Home")
+
+
 class CupidGPTBot:
     """Main bot class that coordinates all functionality."""
     
-    def __init__(self):
-        # Load environment variables
-        load_dotenv()
+    # Upper bound on messages being processed by the LLM at the same time
+    LLM_CONCURRENCY = 16
+    
+    # Pending-input state expires after this long; expired entries are swept at most this often
+    WAITING_TTL = 30 * 60
+    WAITING_SWEEP_INTERVAL = 10 * 60
+    
+    # Inline keyboard callback data -> (menu title, keyboard getter name)
+    _MENU_CALLBACKS = {
+        'main': (_MAIN_MENU_TITLE, 'get_main_menu_keyboard'),
+        'appointments': (_APPOINTMENTS_MENU_TITLE, 'get_appointments_menu_keyboard'),
+        'checklists': (_CHECKLISTS_MENU_TITLE, 'get_checklists_menu_keyboard'),
+        'settings': (_SETTINGS_MENU_TITLE, 'get_settings_menu_keyboard'),
+    }
+    
+    # Inline keyboard callback data -> command handler name
+    _ACTION_CALLBACKS = {
+        'new_appointment': 'new_appointment_command',
+        'list_appointments': 'list_appointments_command',
+        'new_checklist': 'new_checklist_command',
+        'view_checklist': 'view_checklist_command',
+        'pair': 'pair_command',
+        'status': 'status_command',
+    }
+    
+    def __init__(self, cfg: Optional[Config] = None):
+        # Environment variables are read once per process, unless a configuration is injected
+        self.cfg = cfg if cfg is not None else load_config()
+        
+        # Keyword arguments shared by every /help reply
+        self._help_kwargs = {'parse_mode': ParseMode.MARKDOWN}
         
         # Initialize logging
         self.setup_logging()
         
         # Initialize components
-        self.db = DatabaseManager(os.getenv('DATABASE_PATH', 'data/cupidgpt.db'))
-        self.openai_client = LLMClient(os.getenv('GEMINI_API_KEY'))
+        self.db = DatabaseManager.for_path(self.cfg.db_path)
+        self.openai_client = LLMClient(self.cfg.gemini_key, semantic_cache=self.cfg.semantic_cache_enabled)
         self.user_manager = UserManager(self.db)
         self.appointment_manager = AppointmentManager(self.db, self.openai_client)
         self.checklist_manager = ChecklistManager(self.db, self.openai_client)
         
-        # Debug mode
-        self.debug_mode = os.getenv('DEBUG_MODE', 'false').lower() == 'true'
+        # Static keyboards are immutable, so build them once and reuse them per reply
+        self._main_menu_kb = InlineKeyboardMarkup([
+            [InlineKeyboardButton("📅 Appointments", callback_data="menu:appointments")],
+            [InlineKeyboardButton("✅ Checklists", callback_data="menu:checklists")],
+            [InlineKeyboardButton("⚙️ Settings", callback_data="menu:settings")]
+        ])
+        self._appointments_menu_kb = InlineKeyboardMarkup([
+            [InlineKeyboardButton("➕ Create new appointment", callback_data="action:new_appointment")],
+            [InlineKeyboardButton("📋 Show upcoming appointments", callback_data="action:list_appointments")],
+            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu:main")]
+        ])
+        self._checklists_menu_kb = InlineKeyboardMarkup([
+            [InlineKeyboardButton("➕ Create new checklist", callback_data="action:new_checklist")],
+            [InlineKeyboardButton("📋 Show existing Checklists", callback_data="action:view_checklist")],
+            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu:main")]
+        ])
+        self._settings_menu_kb = InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔗 Pair with a user", callback_data="action:pair")],
+            [InlineKeyboardButton("📊 Account status", callback_data="action:status")],
+            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu:main")]
+        ])
+        self._persistent_menu_kb = ReplyKeyboardMarkup([
+            [KeyboardButton("📅 Appointments"), KeyboardButton("✅ Checklists")],
+            [KeyboardButton("🏠 Home")]
+        ], resize_keyboard=True)
+        self._confirm_kbs = {
+            kind: InlineKeyboardMarkup([[
+                InlineKeyboardButton("✅ Confirm", callback_data=f"confirm:{kind}"),
+                InlineKeyboardButton("❌ Cancel", callback_data=f"cancel:{kind}")
+            ]])
+            for kind in ('appointment', 'checklist')
+        }
+        
+        # Menu button text -> handler(update, context), resolved with a single dict lookup
+        self._menu_handlers = self._build_menu_handlers()
+        
+        # Callback data category -> handler(query, action, update, context)
+        self._callback_handlers = {
+            'menu': self._handle_menu_callback,
+            'action': self._handle_action_callback,
+            'confirm': self._handle_confirm_callback,
+            'cancel': self._handle_cancel_callback,
+            'toggle_item': self._handle_toggle_item_callback,
+        }
+        
+        # Strong references to fire-and-forget tasks so they are not garbage collected
+        self._bg_tasks = set()
+        
+        # Bounds concurrent LLM calls (and the database writes that follow them) during bursts
+        self._llm_sem = asyncio.Semaphore(self.LLM_CONCURRENCY)
+        
+        # Blocking database work runs here, one thread per pooled connection
+        self._db_executor = ThreadPoolExecutor(max_workers=DatabaseManager.POOL_SIZE,
+                                               thread_name_prefix='db')
+        
+        # Telegram user id -> (input kind being waited for, monotonic time it was set)
+        self._waiting: Dict[int, Tuple[str, float]] = {}
+        self._waiting_swept_at = time.monotonic()
         
         # Initialize Telegram bot
-        self.app = Application.builder().token(os.getenv('TELEGRAM_BOT_TOKEN')).build()
+        # Updates from different chats run concurrently; _per_chat keeps each chat in order
+        self._chat_locks: 'weakref.WeakValueDictionary[int, asyncio.Lock]' = weakref.WeakValueDictionary()
+        self.app = (
+            Application.builder()
+            .token(self.cfg.telegram_token)
+            .concurrent_updates(True)
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+            .build()
+        )
         self.setup_handlers()
         
         # Initialize reminder service
@@ -53,162 +241,164 @@ class CupidGPTBot:
     
     def setup_logging(self):
         """Setup logging configuration."""
-        log_level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper())
-        log_file = os.getenv('LOG_FILE', 'logs/cupidgpt.log')
+        log_level = self.cfg.log_level
+        log_file = self.cfg.log_file
         
         # Create logs directory if it doesn't exist
         os.makedirs(os.path.dirname(log_file), exist_ok=True)
         
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(formatter)
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+        
+        # Handlers on the event loop only enqueue records; a listener thread does the I/O
+        log_queue = queue.SimpleQueue()
+        self._log_listener = logging.handlers.QueueListener(
+            log_queue, file_handler, stream_handler, respect_handler_level=True
+        )
+        self._log_listener.start()
+        
+        # The queue handler only renders the message; the listener's handlers add the prefix
         logging.basicConfig(
             level=log_level,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file),
-                logging.StreamHandler()
-            ]
+            format='%(message)s',
+            handlers=[logging.handlers.QueueHandler(log_queue)]
         )
     
     def setup_handlers(self):
         """Setup command and message handlers."""
-        # Command handlers
-        self.app.add_handler(CommandHandler("start", self.start_command))
-        self.app.add_handler(CommandHandler("help", self.help_command))
-        self.app.add_handler(CommandHandler("pair", self.pair_command))
-        self.app.add_handler(CommandHandler("new_appointment", self.new_appointment_command))
-        self.app.add_handler(CommandHandler("list_appointments", self.list_appointments_command))
-        self.app.add_handler(CommandHandler("new_checklist", self.new_checklist_command))
-        self.app.add_handler(CommandHandler("view_checklist", self.view_checklist_command))
-        self.app.add_handler(CommandHandler("status", self.status_command))
+        # Command handlers share the per-chat lock, so a command cannot interleave with
+        # another update from the same chat
+        self.app.add_handler(CommandHandler("start", self._per_chat(self.start_command)))
+        self.app.add_handler(CommandHandler("help", self._per_chat(self.help_command)))
+        self.app.add_handler(CommandHandler("pair", self._per_chat(self.pair_command)))
+        self.app.add_handler(CommandHandler("new_appointment", self._per_chat(self.new_appointment_command)))
+        self.app.add_handler(CommandHandler("list_appointments", self._per_chat(self.list_appointments_command)))
+        self.app.add_handler(CommandHandler("new_checklist", self._per_chat(self.new_checklist_command)))
+        self.app.add_handler(CommandHandler("view_checklist", self._per_chat(self.view_checklist_command)))
+        self.app.add_handler(CommandHandler("status", self._per_chat(self.status_command)))
+        
+        # Menu button texts are matched by an exact-text filter before the generic handler
+        self.app.add_handler(MessageHandler(
+            filters.Text(list(self._menu_handlers)),
+            self._per_chat(self._menu_router)
+        ))
         
         # Message handler for natural language processing
         self.app.add_handler(MessageHandler(
             filters.TEXT & ~filters.COMMAND, 
-            self.handle_message
+            self._per_chat(self.handle_message)
         ))
         
         # Callback query handler for inline keyboards
-        self.app.add_handler(CallbackQueryHandler(self.handle_callback))
+        self.app.add_handler(CallbackQueryHandler(self._per_chat(self.handle_callback)))
         
         # Error handler
         self.app.add_error_handler(self.error_handler)
     
+    def _per_chat(self, callback):
+        """Wrap a handler so updates from the same chat are processed one at a time."""
+        @wraps(callback)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            chat = update.effective_chat
+            if chat is None:
+                return await callback(update, context)
+            
+            # Locks live only while a handler holds or waits on them
+            lock = self._chat_locks.get(chat.id)
+            if lock is None:
+                lock = self._chat_locks[chat.id] = asyncio.Lock()
+            async with lock:
+                return await callback(update, context)
+        return wrapper
+    
     def get_main_menu_keyboard(self):
         """Returns the main menu inline keyboard."""
-        keyboard = [
-            [InlineKeyboardButton("📅 Appointments", callback_data="menu:appointments")],
-            [InlineKeyboardButton("✅ Checklists", callback_data="menu:checklists")],
-            [InlineKeyboardButton("⚙️ Settings", callback_data="menu:settings")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return self._main_menu_kb
 
     def get_appointments_menu_keyboard(self):
         """Returns the appointments submenu inline keyboard."""
-        keyboard = [
-            [InlineKeyboardButton("➕ Create new appointment", callback_data="action:new_appointment")],
-            [InlineKeyboardButton("📋 Show upcoming appointments", callback_data="action:list_appointments")],
-            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu:main")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return self._appointments_menu_kb
 
     def get_checklists_menu_keyboard(self):
         """Returns the checklists submenu inline keyboard."""
-        keyboard = [
-            [InlineKeyboardButton("➕ Create new checklist", callback_data="action:new_checklist")],
-            [InlineKeyboardButton("📋 Show existing Checklists", callback_data="action:view_checklist")],
-            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu:main")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return self._checklists_menu_kb
 
     def get_settings_menu_keyboard(self):
         """Returns the settings submenu inline keyboard."""
-        keyboard = [
-            [InlineKeyboardButton("🔗 Pair with a user", callback_data="action:pair")],
-            [InlineKeyboardButton("📊 Account status", callback_data="action:status")],
-            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu:main")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return self._settings_menu_kb
 
     def get_persistent_menu_keyboard(self):
         """Returns the persistent reply keyboard for main navigation."""
-        keyboard = [
-            [KeyboardButton("📅 Appointments"), KeyboardButton("✅ Checklists")],
-            [KeyboardButton("🏠 Home")]
-        ]
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        return self._persistent_menu_kb
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command."""
         user = update.effective_user
         chat_id = update.effective_chat.id
         
-        # Register user
-        success = self.user_manager.register_user(
+        # Register user before replying, so a failure is reported and /pair never runs ahead of it
+        success = await self._db(
+            self.user_manager.register_user,
             user.id, user.username, user.first_name, user.last_name
         )
-        
-        if success:
-            welcome_message = f"""
-🎯 *Welcome to CupidGPT!* 🎯
-
-Hello {user.first_name}! I'm your personal appointment and checklist assistant.
-
-*What I can do:*
-• 📅 Help you create and manage appointments
-• ✅ Create and share checklists with your partner
-• 🔔 Send reminders for upcoming appointments
-• 🤖 Understand natural language for easy interaction
-
-*Getting Started:*
-1. First, you need to pair with your partner using `/pair @username`
-2. Then you can start creating appointments and checklists!
-
-Use `/help` to see all available commands.
-            """
-            
-            # Create keyboard
-            reply_markup = self.get_persistent_menu_keyboard()
-
-            await update.effective_message.reply_text(
-                welcome_message, 
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=reply_markup
-            )
-        else:
+        if not success:
             await update.effective_message.reply_text(
                 "❌ Sorry, there was an error registering your account. Please try again."
             )
+            return
+        
+        welcome_message = _WELCOME_TEMPLATE.format(name=escape_md(user.first_name))
+        
+        # Create keyboard
+        reply_markup = self.get_persistent_menu_keyboard()
+
+        await update.effective_message.reply_text(
+            welcome_message, 
+            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=reply_markup
+        )
+    
+    async def _post_init(self, application: Application):
+        """Warm up the LLM connection in the background once the event loop is running."""
+        self._spawn_background(self.openai_client.warmup())
+    
+    async def _is_paired(self, user_id: int) -> bool:
+        """Check pairing, answering from the user manager's cache without a thread hop when possible."""
+        paired = self.user_manager.peek_paired(user_id)
+        if paired is None:
+            paired = await self._db(self.user_manager.is_user_paired, user_id)
+        return paired
+    
+    async def _db(self, fn, *args, **kwargs):
+        """Run a blocking database-backed call on the database executor."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._db_executor, partial(fn, *args, **kwargs)
+        )
+    
+    async def _post_shutdown(self, application: Application):
+        """Flush queued log records and stop the logging thread."""
+        logging.info("CupidGPT Bot stopped")
+        self._log_listener.stop()
+    
+    def _spawn_background(self, coro):
+        """Run a coroutine as a background task, keeping a reference until it finishes."""
+        task = asyncio.create_task(coro)
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._on_background_done)
+        return task
+    
+    def _on_background_done(self, task: asyncio.Task):
+        """Drop a finished background task and log its failure, if any."""
+        self._bg_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("Background task failed: %s", task.exception())
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /help command."""
-        help_text = """
-🤖 *CupidGPT Commands*
-
-*User Management:*
-• `/start` - Initialize bot and register
-• `/pair @username` - Pair with your partner
-• `/status` - Check your pairing status
-
-*Appointments:*
-• `/new_appointment` - Create a new appointment
-• `/list_appointments` - View upcoming appointments
-
-*Checklists:*
-• `/new_checklist` - Create a new checklist
-• `/view_checklist` - View existing checklists
-
-*Smart Features:*
-Just send me a message in natural language like:
-• "Remind me about dinner on Friday at 7pm"
-• "Create a grocery list with milk, bread, and eggs"
-• "We have a meeting tomorrow at the office"
-
-I'll automatically parse your request and create appointments or checklist items!
-
-*Need Help?*
-Type `/help` anytime to see this message again.
-        """
-        
-        await update.effective_message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
+        await update.effective_message.reply_text(_HELP_TEXT, **self._help_kwargs)
     
     async def pair_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /pair command."""
@@ -224,23 +414,30 @@ Type `/help` anytime to see this message again.
         
         if result['success']:
             await update.effective_message.reply_text(
-                f"✅ {result['message']}",
+                f"✅ {escape_md(result['message'])}",
                 parse_mode=ParseMode.MARKDOWN
             )
         else:
             await update.effective_message.reply_text(
-                f"❌ {result['message']}",
+                f"❌ {escape_md(result['message'])}",
                 parse_mode=ParseMode.MARKDOWN
             )
     
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /status command."""
-        status = self.user_manager.get_user_status(update.effective_user.id)
+        status = await self._db(self.user_manager.get_user_status, update.effective_user.id)
+        if self.cfg.debug_mode:
+            stats = self.openai_client.cache_stats()
+            # Cache names such as semantic_intent contain Markdown characters
+            status += "\n🧠 LLM cache: " + ", ".join(
+                f"{escape_md(name)} {counts['hits']}/{counts['hits'] + counts['misses']} hits"
+                for name, counts in stats.items()
+            )
         await update.effective_message.reply_text(status, parse_mode=ParseMode.MARKDOWN)
     
     async def new_appointment_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /new_appointment command."""
-        if not self.debug_mode and not self.user_manager.is_user_paired(update.effective_user.id):
+        if not self.cfg.debug_mode and not await self._is_paired(update.effective_user.id):
             await update.effective_message.reply_text(
                 "❌ You need to pair with your partner first. Use `/pair @username`",
                 parse_mode=ParseMode.MARKDOWN
@@ -258,7 +455,7 @@ Type `/help` anytime to see this message again.
         )
         
         # Set state for next message
-        context.user_data['waiting_for'] = 'appointment'
+        self._set_waiting(update.effective_user.id, 'appointment')
     
     async def list_appointments_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /list_appointments command."""
@@ -271,14 +468,17 @@ Type `/help` anytime to see this message again.
             )
             return
         
-        message = "📅 *Upcoming Appointments:*\n\n"
+        parts = ["📅 *Upcoming Appointments:*\n\n"]
         for apt in appointments:
-            message += f"• *{apt['title']}*\n"
-            message += f"  📍 {apt.get('location', 'No location')}\n"
-            message += f"  🕐 {apt['appointment_date']}\n"
+            parts.append(
+                f"• *{escape_md(apt['title'])}*\n"
+                f"  📍 {escape_md(apt.get('location', 'No location'))}\n"
+                f"  🕐 {apt['appointment_date']}\n"
+            )
             if apt.get('description'):
-                message += f"  📝 {apt['description']}\n"
-            message += f"  👤 Created by: {apt.get('creator_name', 'Unknown')}\n\n"
+                parts.append(f"  📝 {escape_md(apt['description'])}\n")
+            parts.append(f"  👤 Created by: {escape_md(apt.get('creator_name', 'Unknown'))}\n\n")
+        message = "".join(parts)
         
         await update.effective_message.reply_text(
             message, 
@@ -288,7 +488,7 @@ Type `/help` anytime to see this message again.
     
     async def new_checklist_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /new_checklist command."""
-        if not self.debug_mode and not self.user_manager.is_user_paired(update.effective_user.id):
+        if not self.cfg.debug_mode and not await self._is_paired(update.effective_user.id):
             await update.effective_message.reply_text(
                 "❌ You need to pair with your partner first. Use `/pair @username`",
                 parse_mode=ParseMode.MARKDOWN
@@ -305,33 +505,31 @@ Type `/help` anytime to see this message again.
         )
         
         # Set state for next message
-        context.user_data['waiting_for'] = 'checklist'
+        self._set_waiting(update.effective_user.id, 'checklist')
     
     async def view_checklist_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /view_checklist command."""
-        checklists = await self.checklist_manager.get_user_checklists(update.effective_user.id)
+        # For now, just show the most recent checklist
+        # In a full implementation, you'd show a selection menu
+        checklist = await self.checklist_manager.get_latest_checklist_with_items(update.effective_user.id)
         
-        if not checklists:
+        if not checklist:
             await update.effective_message.reply_text(
                 "✅ No checklists found.",
                 reply_markup=self.get_checklists_menu_keyboard()
             )
             return
         
-        # For now, just show the first checklist
-        # In a full implementation, you'd show a selection menu
-        checklist = checklists[0]
-        items = await self.checklist_manager.get_checklist_items(checklist['id'])
-        
-        message = f"✅ *{checklist['title']}*\n\n"
-        if checklist.get('description'):
-            message += f"📝 {checklist['description']}\n\n"
+        parts = [f"✅ *{escape_md(checklist.title)}*\n\n"]
+        if checklist.description:
+            parts.append(f"📝 {escape_md(checklist.description)}\n\n")
         
-        for item in items:
-            status = "✅" if item['completed'] else "⬜"
-            message += f"{status} {item['text']}\n"
-            if item['completed'] and item.get('completed_by_name'):
-                message += f"   └ Completed by {item['completed_by_name']}\n"
+        for item in checklist.items:
+            status = "✅" if item.completed else "⬜"
+            parts.append(f"{status} {escape_md(item.text)}\n")
+            if item.completed and item.completed_by_name:
+                parts.append(f"   └ Completed by {escape_md(item.completed_by_name)}\n")
+        message = "".join(parts)
         
         await update.effective_message.reply_text(
             message, 
@@ -339,32 +537,36 @@ Type `/help` anytime to see this message again.
             reply_markup=self.get_checklists_menu_keyboard()
         )
     
+    def _set_waiting(self, user_id: int, kind: str):
+        """Remember that the next message from user_id is input of the given kind."""
+        now = time.monotonic()
+        if now - self._waiting_swept_at >= self.WAITING_SWEEP_INTERVAL:
+            cutoff = now - self.WAITING_TTL
+            self._waiting = {uid: entry for uid, entry in self._waiting.items() if entry[1] > cutoff}
+            self._waiting_swept_at = now
+        self._waiting[user_id] = (kind, now)
+    
+    def _get_waiting(self, user_id: int) -> Optional[str]:
+        """Return the input kind user_id is expected to send, if it has not expired."""
+        entry = self._waiting.get(user_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.WAITING_TTL:
+            del self._waiting[user_id]
+            return None
+        return entry[0]
+    
+    async def _menu_router(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Dispatch a menu button text to its handler."""
+        await self._menu_handlers[update.message.text](update, context)
+    
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle text messages with navigation and natural language processing."""
+        """Handle pending input and natural language messages."""
         user_id = update.effective_user.id
         message_text = update.message.text
         
-        # --- Navigation & Menus (Legacy Support/Text Fallback) ---
-        
-        if await self._handle_menu_navigation(message_text, update):
-            return
-
-        if await self._handle_menu_actions(message_text, update, context):
-            return
-
-        if await self._handle_legacy_commands(message_text, update, context):
-            return
-
-        # --- Logic Checks ---
-        
-        # Check if user is paired (required for most actions)
-        if not self.user_manager.is_user_paired(user_id):
-            # Allow Pairing/Settings interactions even if not paired? 
-            # If they are just navigating menus, we shouldn't block. 
-            pass 
-        
         # Check if we're waiting for specific input
-        waiting_for = context.user_data.get('waiting_for')
+        waiting_for = self._get_waiting(user_id)
         if waiting_for:
             await self._process_pending_input(message_text, waiting_for, update, context)
             return
@@ -373,109 +575,95 @@ Type `/help` anytime to see this message again.
         result = await self.process_natural_language(message_text, user_id)
         await update.effective_message.reply_text(result, parse_mode=ParseMode.MARKDOWN)
 
-    async def _handle_menu_navigation(self, text: str, update: Update) -> bool:
-        """Handle main menu navigation commands."""
-        if text in ["Agendas", "📅 Appointments", "Appointments", "/appointments"]:
-            await update.effective_message.reply_text("📅 *Appointments Menu*", parse_mode=ParseMode.MARKDOWN, reply_markup=self.get_appointments_menu_keyboard())
-            return True
-        elif text in ["✅ Checklists", "Checklists", "/checklists"]:
-            await update.effective_message.reply_text("✅ *Checklists Menu*", parse_mode=ParseMode.MARKDOWN, reply_markup=self.get_checklists_menu_keyboard())
-            return True
-        elif text in ["Settings", "/settings"]:
-            await update.effective_message.reply_text("⚙️ *Settings Menu*", parse_mode=ParseMode.MARKDOWN, reply_markup=self.get_settings_menu_keyboard())
-            return True
-        elif text in ["🏠 Home", "Home", "Back"]:
-            await update.effective_message.reply_text("🏠 *Home*", parse_mode=ParseMode.MARKDOWN, reply_markup=self.get_main_menu_keyboard())
-            return True
-        return False
-
-    async def _handle_menu_actions(self, text: str, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-        """Handle specific menu actions."""
-        if text == "Create new appointment":
-            await self.new_appointment_command(update, context)
-            return True
-        elif text == "Show upcoming appointments":
-            await self.list_appointments_command(update, context)
-            return True
-        elif text == "Create new checklist":
-            await self.new_checklist_command(update, context)
-            return True
-        elif text == "Show existing Checklists":
-            await self.view_checklist_command(update, context)
-            return True
-        elif text == "Pair with a user":
-            await self.pair_command(update, context)
-            return True
-        elif text == "Account status":
-            await self.status_command(update, context)
-            return True
-        return False
-
-    async def _handle_legacy_commands(self, text: str, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
-        """Handle legacy or direct commands."""
-        if text == "Pair": 
-             await self.pair_command(update, context)
-             return True
-        elif text == "Status":
-             await self.status_command(update, context)
-             return True
-        elif text == "New Appointment":
-             await self.new_appointment_command(update, context)
-             return True
-        elif text == "List Appointments":
-             await self.list_appointments_command(update, context)
-             return True
-        elif text == "New Checklist":
-             await self.new_checklist_command(update, context)
-             return True
-        elif text == "View Checklists":
-             await self.view_checklist_command(update, context)
-             return True
-        return False
+    def _build_menu_handlers(self) -> Dict[str, Any]:
+        """Build the menu button text to handler mapping used by _menu_router."""
+        appointments_menu = partial(self._send_menu, _APPOINTMENTS_MENU_TITLE, self.get_appointments_menu_keyboard)
+        checklists_menu = partial(self._send_menu, _CHECKLISTS_MENU_TITLE, self.get_checklists_menu_keyboard)
+        settings_menu = partial(self._send_menu, _SETTINGS_MENU_TITLE, self.get_settings_menu_keyboard)
+        home_menu = partial(self._send_menu, _HOME_MENU_TITLE, self.get_main_menu_keyboard)
+        
+        handlers = {}
+        
+        # Main menu navigation
+        for text in ("Agendas", "📅 Appointments", "Appointments", "/appointments"):
+            handlers[text] = appointments_menu
+        for text in ("✅ Checklists", "Checklists", "/checklists"):
+            handlers[text] = checklists_menu
+        for text in ("Settings", "/settings"):
+            handlers[text] = settings_menu
+        for text in ("🏠 Home", "Home", "Back"):
+            handlers[text] = home_menu
+        
+        # Submenu actions and legacy/direct commands
+        handlers.update({
+            "Create new appointment": self.new_appointment_command,
+            "Show upcoming appointments": self.list_appointments_command,
+            "Create new checklist": self.new_checklist_command,
+            "Show existing Checklists": self.view_checklist_command,
+            "Pair with a user": self.pair_command,
+            "Account status": self.status_command,
+            "Pair": self.pair_command,
+            "Status": self.status_command,
+            "New Appointment": self.new_appointment_command,
+            "List Appointments": self.list_appointments_command,
+            "New Checklist": self.new_checklist_command,
+            "View Checklists": self.view_checklist_command,
+        })
+        return handlers
+
+    async def _send_menu(self, title: Tuple[str, Tuple[MessageEntity, ...]], keyboard_getter,
+                         update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Reply with a menu title (text, entities) and its inline keyboard."""
+        text, entities = title
+        await update.effective_message.reply_text(text, entities=entities, reply_markup=keyboard_getter())
 
     async def _process_pending_input(self, text: str, waiting_for: str, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process input when waiting for specific details."""
         if waiting_for == 'appointment':
              # Instead of creating immediately, extract details and ask for confirmation
-            details = await self.openai_client.extract_appointment_details(text)
-            context.user_data.pop('waiting_for', None)
+            async with self._llm_sem:
+                details = await self.openai_client.extract_appointment_details(text)
+            self._waiting.pop(update.effective_user.id, None)
             
-            if not details.get('success'):
+            # Parsed once here so confirming need not
+            appointment_datetime = None
+            if details.get('success'):
+                try:
+                    appointment_datetime = datetime.fromisoformat(details['appointment_datetime'])
+                except (KeyError, TypeError, ValueError) as e:
+                    logging.error("Invalid extracted appointment datetime: %s", e)
+            
+            if appointment_datetime is None:
                 await update.effective_message.reply_text(
-                    f"❌ {details.get('error', 'Failed to understand appointment details')}",
+                    f"❌ {details.get('error') or 'Failed to understand appointment details'}",
                     reply_markup=self.get_appointments_menu_keyboard()
                 )
                 return
 
             # Store details in user_data for callback access
+            details['appointment_datetime_obj'] = appointment_datetime
             context.user_data['pending_appointment'] = details
             
             preview_msg = (
                 f"📅 *Confirm Appointment*\n\n"
-                f"Title: {details['title']}\n"
-                f"Date: {details['appointment_datetime']}\n"
-                f"Location: {details.get('location', 'Not specified')}\n"
-                f"Description: {details.get('description', 'None')}\n\n"
+                f"Title: {escape_md(details['title'])}\n"
+                f"Date: {escape_md(details['appointment_datetime'])}\n"
+                f"Location: {escape_md(details.get('location', 'Not specified'))}\n"
+                f"Description: {escape_md(details.get('description', 'None'))}\n\n"
                 f"Does this look correct?"
             )
             
-            keyboard = [
-                [
-                    InlineKeyboardButton("✅ Confirm", callback_data="confirm:appointment"),
-                    InlineKeyboardButton("❌ Cancel", callback_data="cancel:appointment")
-                ]
-            ]
-            
             await update.effective_message.reply_text(
                 preview_msg,
                 parse_mode=ParseMode.MARKDOWN,
-                reply_markup=InlineKeyboardMarkup(keyboard)
+                reply_markup=self._confirm_kbs['appointment']
             )
 
         elif waiting_for == 'checklist':
              # Instead of creating immediately, extract details and ask for confirmation
-            details = await self.openai_client.extract_checklist_details(text)
-            context.user_data.pop('waiting_for', None)
+            async with self._llm_sem:
+                details = await self.openai_client.extract_checklist_details(text)
+            self._waiting.pop(update.effective_user.id, None)
             
             if not details.get('success'):
                 await update.effective_message.reply_text(
@@ -487,124 +675,93 @@ Type `/help` anytime to see this message again.
             # Store details in user_data for callback access
             context.user_data['pending_checklist'] = details
             
-            items_str = "\\n".join([f"• {item}" for item in details['items']])
+            items_str = "\n".join([f"• {escape_md(item)}" for item in details['items']])
             preview_msg = (
                 f"📋 *Confirm Checklist*\n\n"
-                f"Title: {details['title']}\n"
-                f"Description: {details.get('description', 'None')}\n\n"
+                f"Title: {escape_md(details['title'])}\n"
+                f"Description: {escape_md(details.get('description', 'None'))}\n\n"
                 f"Items:\n{items_str}\n\n"
                 f"Does this look correct?"
             )
             
-            keyboard = [
-                [
-                    InlineKeyboardButton("✅ Confirm", callback_data="confirm:checklist"),
-                    InlineKeyboardButton("❌ Cancel", callback_data="cancel:checklist")
-                ]
-            ]
-            
             await update.effective_message.reply_text(
                 preview_msg,
                 parse_mode=ParseMode.MARKDOWN,
-                reply_markup=InlineKeyboardMarkup(keyboard)
+                reply_markup=self._confirm_kbs['checklist']
             )
     
     async def process_natural_language(self, text: str, user_id: int) -> str:
         """Process natural language input to determine intent."""
         try:
-            # Use OpenAI to determine intent
-            intent = await self.openai_client.determine_intent(text)
-            
-            if intent['type'] == 'appointment':
-                result = await self.appointment_manager.create_appointment_from_text(text, user_id)
-                if result['success']:
-                    return f"✅ Created appointment: *{result['appointment']['title']}*"
-                else:
-                    return f"❌ {result['message']}"
-            
-            elif intent['type'] == 'checklist':
-                result = await self.checklist_manager.create_checklist_from_text(text, user_id)
-                if result['success']:
-                    return f"✅ Created checklist: *{result['checklist']['title']}*"
+            async with self._llm_sem:
+                # Use the local patterns first; for ambiguous text one LLM call both
+                # classifies it and extracts the details
+                details = None
+                intent_type = _local_intent(text)
+                if intent_type is None:
+                    classified = await self.openai_client.classify_and_extract(text)
+                    intent_type, details = classified['type'], classified['details']
+                
+                if intent_type == 'appointment':
+                    if details is None:
+                        details = await self.openai_client.extract_appointment_details(text)
+                    result = await self.appointment_manager.create_appointment_from_details(details, user_id)
+                    if result['success']:
+                        return f"✅ Created appointment: *{escape_md(result['appointment']['title'])}*"
+                    else:
+                        return f"❌ {escape_md(result['message'])}"
+                
+                elif intent_type == 'checklist':
+                    if details is None:
+                        details = await self.openai_client.extract_checklist_details(text)
+                    result = await self.checklist_manager.create_checklist_from_details(details, user_id)
+                    if result['success']:
+                        return f"✅ Created checklist: *{escape_md(result['checklist']['title'])}*"
+                    else:
+                        return f"❌ {escape_md(result['message'])}"
+                
                 else:
-                    return f"❌ {result['message']}"
-            
-            else:
-                return ("🤔 I'm not sure what you want me to do. Try using one of the commands "
-                       "like `/new_appointment` or `/new_checklist`, or be more specific!")
+                    return ("🤔 I'm not sure what you want me to do. Try using one of the commands "
+                           "like `/new_appointment` or `/new_checklist`, or be more specific!")
                 
         except Exception as e:
-            logging.error(f"Error processing natural language: {e}")
+            logging.error("Error processing natural language: %s", e)
             return "❌ Sorry, I had trouble understanding that. Please try again or use a specific command."
     
     async def handle_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle callback queries from inline keyboards."""
         query = update.callback_query
-        user_id = update.effective_user.id
         # We'll answer the query within specific branches to allow custom toast messages
         
-        # Parse callback data
-        data = query.data.split(':')
-        category = data[0]
-        action = data[1]
-        
-        if category == 'menu':
-            await self._handle_menu_callback(query, action)
-        elif category == 'action':
-            await self._handle_action_callback(query, action, update, context)
-        elif category == 'confirm':
-            await self._handle_confirm_callback(query, action, user_id, context)
-        elif category == 'cancel':
-            await self._handle_cancel_callback(query, action, context)
-        elif category == 'toggle_item':
-             await self._handle_toggle_item_callback(query, action, user_id)
-
-    async def _handle_menu_callback(self, query, action):
+        # Parse callback data ("category:action")
+        category, _, action = query.data.partition(':')
+        
+        handler = self._callback_handlers.get(category)
+        if handler is not None:
+            await handler(query, action, update, context)
+
+    async def _handle_menu_callback(self, query, action, update, context):
         """Handle menu navigation callbacks."""
         await query.answer()
-        if action == 'main':
+        entry = self._MENU_CALLBACKS.get(action)
+        if entry is not None:
+            (text, entities), keyboard_getter = entry
             await query.edit_message_text(
-                "🔙 *Main Menu*",
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=self.get_main_menu_keyboard()
-            )
-        elif action == 'appointments':
-            await query.edit_message_text(
-                "📅 *Appointments Menu*",
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=self.get_appointments_menu_keyboard()
-            )
-        elif action == 'checklists':
-            await query.edit_message_text(
-                "✅ *Checklists Menu*",
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=self.get_checklists_menu_keyboard()
-            )
-        elif action == 'settings':
-            await query.edit_message_text(
-                "⚙️ *Settings Menu*",
-                parse_mode=ParseMode.MARKDOWN,
-                reply_markup=self.get_settings_menu_keyboard()
+                text,
+                entities=entities,
+                reply_markup=getattr(self, keyboard_getter)()
             )
 
     async def _handle_action_callback(self, query, action, update, context):
         """Handle specific action callbacks."""
         await query.answer()
-        if action == 'new_appointment':
-            await self.new_appointment_command(update, context)
-        elif action == 'list_appointments':
-            await self.list_appointments_command(update, context)
-        elif action == 'new_checklist':
-            await self.new_checklist_command(update, context)
-        elif action == 'view_checklist':
-            await self.view_checklist_command(update, context)
-        elif action == 'pair':
-            await self.pair_command(update, context)
-        elif action == 'status':
-            await self.status_command(update, context)
-
-    async def _handle_confirm_callback(self, query, action, user_id, context):
+        handler_name = self._ACTION_CALLBACKS.get(action)
+        if handler_name is not None:
+            await getattr(self, handler_name)(update, context)
+
+    async def _handle_confirm_callback(self, query, action, update, context):
         """Handle confirmation callbacks."""
+        user_id = update.effective_user.id
         if action == 'appointment':
             details = context.user_data.pop('pending_appointment', None)
             if not details:
@@ -612,22 +769,23 @@ Type `/help` anytime to see this message again.
                 return
             
             # Actually create the appointment
-            appointment_datetime = datetime.fromisoformat(details['appointment_datetime'])
-            appointment_id = self.db.create_appointment(
+            appointment_id = await self._db(
+                self.db.create_appointment,
                 title=details['title'],
                 description=details.get('description', ''),
-                appointment_date=appointment_datetime,
+                appointment_date=details['appointment_datetime_obj'],
                 location=details.get('location', ''),
-                created_by_telegram_id=user_id
+                created_by_telegram_id=user_id,
+                duration_minutes=details.get('duration_minutes') or 60
             )
             
             if appointment_id:
                 await query.answer("✅ Appointment created successfully!", show_alert=False)
                 await query.edit_message_text(
                     f"✅ *Appointment Created!*\n\n"
-                    f"📅 *{details['title']}*\n"
-                    f"🕐 {details['appointment_datetime']}\n"
-                    f"📍 {details.get('location', 'No location')}",
+                    f"📅 *{escape_md(details['title'])}*\n"
+                    f"🕐 {escape_md(details['appointment_datetime'])}\n"
+                    f"📍 {escape_md(details.get('location', 'No location'))}",
                     parse_mode=ParseMode.MARKDOWN,
                     reply_markup=self.get_appointments_menu_keyboard()
                 )
@@ -645,22 +803,22 @@ Type `/help` anytime to see this message again.
                 return
             
             # Actually create the checklist
-            checklist_id = self.db.create_checklist(
+            checklist_id = await self._db(
+                self.db.create_checklist,
                 title=details['title'],
                 description=details.get('description', ''),
                 created_by_telegram_id=user_id
             )
             
             if checklist_id:
-                items_added = []
-                for item_text in details['items']:
-                    if self.db.add_checklist_item(checklist_id, item_text):
-                        items_added.append(item_text)
+                items_added = await self._db(
+                    self.db.add_checklist_items_bulk, checklist_id, details['items']
+                )
                 
                 await query.answer("✅ Checklist created successfully!", show_alert=False)
                 await query.edit_message_text(
                     f"✅ *Checklist Created!*\n\n"
-                    f"📋 *{details['title']}*\n"
+                    f"📋 *{escape_md(details['title'])}*\n"
                     f"Items: {len(items_added)}",
                     parse_mode=ParseMode.MARKDOWN,
                     reply_markup=self.get_checklists_menu_keyboard()
@@ -672,7 +830,7 @@ Type `/help` anytime to see this message again.
                     reply_markup=self.get_checklists_menu_keyboard()
                 )
 
-    async def _handle_cancel_callback(self, query, action, context):
+    async def _handle_cancel_callback(self, query, action, update, context):
         """Handle cancellation callbacks."""
         context.user_data.pop(f'pending_{action}', None)
         await query.answer("❌ Creation cancelled.")
@@ -681,28 +839,28 @@ Type `/help` anytime to see this message again.
         elif action == 'checklist':
             await query.edit_message_text("❌ Checklist creation cancelled.", reply_markup=self.get_checklists_menu_keyboard())
 
-    async def _handle_toggle_item_callback(self, query, action, user_id):
+    async def _handle_toggle_item_callback(self, query, action, update, context):
         """Handle toggle item callbacks."""
+        user_id = update.effective_user.id
         item_id = int(action)
-        success = self.checklist_manager.toggle_item(item_id, user_id)
+        success = await self._db(self.checklist_manager.toggle_item, item_id, user_id)
         
         if success:
             await query.answer("✅ Item status updated!")
             
-            # Fetch item to get checklist ID
-            item = self.db.get_checklist_item(item_id)
-            if item:
-                checklist_id = item['checklist_id']
-                summary = await self.checklist_manager.get_checklist_summary(checklist_id)
-                
-                # Get toggle buttons
-                items = await self.checklist_manager.get_checklist_items(checklist_id)
+            # The item's checklist comes from the manager's item index, falling back to a
+            # database lookup when the item is not indexed
+            checklist_id = await self.checklist_manager.get_item_checklist_id(item_id)
+            checklist = checklist_id and await self.checklist_manager.get_checklist_with_items(checklist_id)
+            if checklist:
+                # Summary and toggle buttons both come from the one checklist query
+                summary = self.checklist_manager.format_checklist_summary(checklist)
                 keyboard = []
-                for item in items:
-                    status = "✅" if item['completed'] else "⬜"
+                for item in checklist.items:
+                    status = "✅" if item.completed else "⬜"
                     keyboard.append([InlineKeyboardButton(
-                        f"{status} {item['text']}", 
-                        callback_data=f"toggle_item:{item['id']}"
+                        f"{status} {item.text}", 
+                        callback_data=f"toggle_item:{item.id}"
                     )])
                 keyboard.append([InlineKeyboardButton("🔙 Back to Checklists", callback_data="menu:checklists")])
                 
@@ -716,7 +874,7 @@ Type `/help` anytime to see this message again.
     
     async def error_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle errors."""
-        logging.error(f"Update {update} caused error {context.error}")
+        logging.error("Update %s caused error %s", update, context.error)
         
         if update and update.effective_message:
             await update.effective_message.reply_text(
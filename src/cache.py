@@ -0,0 +1,106 @@
+import math
+import operator
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Hashable, Optional, Sequence, Tuple
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after a fixed time-to-live."""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if it is missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store value under key, evicting the least recently used entry when full."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove key and return its value (expired or not), or default."""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+    
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SemanticCache:
+    """Bounded store of (embedding, value) pairs looked up by cosine similarity."""
+    
+    def __init__(self, maxsize: int, threshold: float):
+        self.threshold = threshold
+        self._entries: 'deque[Tuple[Tuple[float, ...], Any]]' = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> Tuple[float, ...]:
+        """Scale vector to unit length."""
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return tuple(x / norm for x in vector)
+    
+    def get(self, vector: Sequence[float], default: Any = None) -> Any:
+        """Return the value of the most similar entry at or above the threshold, else default."""
+        query = self._normalize(vector)
+        with self._lock:
+            entries = list(self._entries)
+        
+        best_score, best_value = self.threshold, default
+        found = False
+        for stored, value in entries:
+            # Both sides are unit length, so the dot product is the cosine similarity
+            score = sum(map(operator.mul, query, stored))
+            if score >= best_score:
+                best_score, best_value, found = score, value, True
+        
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return best_value
+    
+    def add(self, vector: Sequence[float], value: Any):
+        """Store value under vector, dropping the oldest entry when full."""
+        entry = (self._normalize(vector), value)
+        with self._lock:
+            self._entries.append(entry)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
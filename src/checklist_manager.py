@@ -1,22 +1,53 @@
+import asyncio
 import logging
 from typing import Dict, Any, List, Optional
-from database import DatabaseManager
+from cache import TTLCache
+from database import Checklist, DatabaseManager
+from formatting import escape_md
 from llm_client import LLMClient
 
 
 class ChecklistManager:
     """Manages checklist creation, item management, and operations."""
     
+    # Checklist reads are cached per checklist id; the write methods here invalidate them
+    CACHE_TTL = 60
+    CACHE_SIZE = 1024
+    ITEM_INDEX_SIZE = 16384
+    
     def __init__(self, db: DatabaseManager, openai_client: LLMClient):
         self.db = db
         self.openai_client = openai_client
+        self._checklist_cache = TTLCache(self.CACHE_SIZE, self.CACHE_TTL)
+        self._items_cache = TTLCache(self.CACHE_SIZE, self.CACHE_TTL)
+        self._with_items_cache = TTLCache(self.CACHE_SIZE, self.CACHE_TTL)
+        # item id -> checklist id for cached items, so toggle_item knows what to invalidate
+        self._item_checklists = TTLCache(self.ITEM_INDEX_SIZE, self.CACHE_TTL)
+    
+    def _invalidate(self, checklist_id: int):
+        """Drop every cached read of the given checklist."""
+        self._checklist_cache.pop(checklist_id)
+        self._items_cache.pop(checklist_id)
+        self._with_items_cache.pop(checklist_id)
     
     async def create_checklist_from_text(self, text: str, user_telegram_id: int) -> Dict[str, Any]:
         """Create a checklist from natural language text."""
         try:
             # Extract checklist details using OpenAI
             details = await self.openai_client.extract_checklist_details(text)
-            
+        except Exception as e:
+            logging.error("Error creating checklist from text: %s", e)
+            return {
+                'success': False,
+                'message': 'An error occurred while creating the checklist'
+            }
+        
+        return await self.create_checklist_from_details(details, user_telegram_id)
+    
+    async def create_checklist_from_details(self, details: Dict[str, Any],
+                                            user_telegram_id: int) -> Dict[str, Any]:
+        """Create a checklist from details already extracted by the LLM client."""
+        try:
             if not details.get('success'):
                 return {
                     'success': False,
@@ -24,7 +55,8 @@ class ChecklistManager:
                 }
             
             # Create the checklist
-            checklist_id = self.db.create_checklist(
+            checklist_id = await asyncio.to_thread(
+                self.db.create_checklist,
                 title=details['title'],
                 description=details.get('description', ''),
                 created_by_telegram_id=user_telegram_id
@@ -36,13 +68,10 @@ class ChecklistManager:
                     'message': 'Failed to create checklist in database'
                 }
             
-            # Add items to the checklist
-            items_added = []
-            for item_text in details['items']:
-                if self.db.add_checklist_item(checklist_id, item_text):
-                    items_added.append(item_text)
-                else:
-                    logging.warning(f"Failed to add item '{item_text}' to checklist {checklist_id}")
+            # Add all items to the checklist in one transaction
+            items_added = await asyncio.to_thread(self.db.add_checklist_items_bulk, checklist_id, details['items'])
+            if len(items_added) != len(details['items']):
+                logging.warning("Added %d of %d items to checklist %s", len(items_added), len(details['items']), checklist_id)
             
             if not items_added:
                 return {
@@ -57,7 +86,7 @@ class ChecklistManager:
                 'items_count': len(items_added)
             }
             
-            logging.info(f"Checklist created: {checklist_id} by user {user_telegram_id} with {len(items_added)} items")
+            logging.info("Checklist created: %s by user %s with %s items", checklist_id, user_telegram_id, len(items_added))
             
             return {
                 'success': True,
@@ -67,7 +96,7 @@ class ChecklistManager:
             }
             
         except Exception as e:
-            logging.error(f"Error creating checklist from text: {e}")
+            logging.error("Error creating checklist from details: %s", e)
             return {
                 'success': False,
                 'message': 'An error occurred while creating the checklist'
@@ -77,14 +106,17 @@ class ChecklistManager:
                                     items: List[str], user_telegram_id: int) -> Dict[str, Any]:
         """Create a checklist with manual input."""
         try:
-            if not items:
+            # Strip each item once; blank items do not count towards the minimum
+            texts = [text for text in (item.strip() for item in items if item) if text]
+            if not texts:
                 return {
                     'success': False,
                     'message': 'Checklist must have at least one item'
                 }
             
             # Create the checklist
-            checklist_id = self.db.create_checklist(
+            checklist_id = await asyncio.to_thread(
+                self.db.create_checklist,
                 title=title,
                 description=description,
                 created_by_telegram_id=user_telegram_id
@@ -96,11 +128,10 @@ class ChecklistManager:
                     'message': 'Failed to create checklist in database'
                 }
             
-            # Add items to the checklist
-            items_added = []
-            for item_text in items:
-                if self.db.add_checklist_item(checklist_id, item_text.strip()):
-                    items_added.append(item_text.strip())
+            # Add all items to the checklist in one transaction
+            items_added = await asyncio.to_thread(self.db.add_checklist_items_bulk, checklist_id, texts)
+            if len(items_added) != len(texts):
+                logging.warning("Added %d of %d items to checklist %s", len(items_added), len(texts), checklist_id)
             
             checklist_data = {
                 'id': checklist_id,
@@ -109,7 +140,7 @@ class ChecklistManager:
                 'items_count': len(items_added)
             }
             
-            logging.info(f"Manual checklist created: {checklist_id} by user {user_telegram_id}")
+            logging.info("Manual checklist created: %s by user %s", checklist_id, user_telegram_id)
             
             return {
                 'success': True,
@@ -119,7 +150,7 @@ class ChecklistManager:
             }
             
         except Exception as e:
-            logging.error(f"Error creating manual checklist: {e}")
+            logging.error("Error creating manual checklist: %s", e)
             return {
                 'success': False,
                 'message': 'An error occurred while creating the checklist'
@@ -128,13 +159,11 @@ class ChecklistManager:
     async def get_user_checklists(self, user_telegram_id: int) -> List[Dict[str, Any]]:
         """Get checklists for a user."""
         try:
-            checklists = self.db.get_checklists(user_telegram_id)
+            # Item counts come from the same query as the checklists
+            checklists = await asyncio.to_thread(self.db.get_checklists_with_stats, user_telegram_id)
             
-            # Add item counts and completion statistics
+            # Add completion statistics
             for checklist in checklists:
-                items = self.db.get_checklist_items(checklist['id'])
-                checklist['total_items'] = len(items)
-                checklist['completed_items'] = len([item for item in items if item['completed']])
                 checklist['completion_percentage'] = (
                     (checklist['completed_items'] / checklist['total_items'] * 100)
                     if checklist['total_items'] > 0 else 0
@@ -143,267 +172,284 @@ class ChecklistManager:
             return checklists
             
         except Exception as e:
-            logging.error(f"Error getting user checklists: {e}")
+            logging.error("Error getting user checklists: %s", e)
             return []
     
     async def get_checklist_items(self, checklist_id: int) -> List[Dict[str, Any]]:
         """Get items for a specific checklist."""
+        cached = self._items_cache.get(checklist_id)
+        if cached is not None:
+            return list(map(dict, cached))
+        
         try:
-            return self.db.get_checklist_items(checklist_id)
+            items = await asyncio.to_thread(self.db.get_checklist_items, checklist_id)
+            self._items_cache.set(checklist_id, tuple(map(dict, items)))
+            for item in items:
+                self._item_checklists.set(item['id'], checklist_id)
+            return items
         except Exception as e:
-            logging.error(f"Error getting checklist items: {e}")
+            logging.error("Error getting checklist items: %s", e)
             return []
     
+    async def get_latest_checklist_with_items(self, user_telegram_id: int) -> Optional[Checklist]:
+        """Get the user's most recent checklist with its items, fetched in one query."""
+        try:
+            return await asyncio.to_thread(self.db.get_latest_checklist_with_items, user_telegram_id)
+        except Exception as e:
+            logging.error("Error getting latest checklist with items: %s", e)
+            return None
+    
+    async def get_checklist_with_items(self, checklist_id: int) -> Optional[Checklist]:
+        """Get a checklist with its items, fetched in one query."""
+        cached = self._with_items_cache.get(checklist_id)
+        if cached is not None:
+            return cached
+        
+        try:
+            checklist = await asyncio.to_thread(self.db.get_checklist_with_items, checklist_id)
+            if checklist is not None:
+                self._with_items_cache.set(checklist_id, checklist)
+                for item in checklist.items:
+                    self._item_checklists.set(item.id, checklist_id)
+            return checklist
+        except Exception as e:
+            logging.error("Error getting checklist with items: %s", e)
+            return None
+    
     async def get_checklist_by_id(self, checklist_id: int) -> Optional[Dict[str, Any]]:
         """Get a specific checklist by ID."""
+        cached = self._checklist_cache.get(checklist_id)
+        if cached is not None:
+            return dict(cached)
+        
+        try:
+            checklist = await asyncio.to_thread(self.db.get_checklist_by_id, checklist_id)
+            if checklist is not None:
+                self._checklist_cache.set(checklist_id, dict(checklist))
+            return checklist
+        except Exception as e:
+            logging.error("Error getting checklist by ID: %s", e)
+            return None
+    
+    async def get_item_checklist_id(self, item_id: int) -> Optional[int]:
+        """Get the id of the checklist an item belongs to, from the cache when its items are loaded."""
+        checklist_id = self._item_checklists.get(item_id)
+        if checklist_id is not None:
+            return checklist_id
+        return await asyncio.to_thread(self._load_item_checklist_id, item_id)
+    
+    def _load_item_checklist_id(self, item_id: int) -> Optional[int]:
+        """Look up the checklist an item belongs to in the database and index it."""
         try:
-            return self.db.get_checklist_by_id(checklist_id)
+            item = self.db.get_checklist_item(item_id)
         except Exception as e:
-            logging.error(f"Error getting checklist by ID: {e}")
+            logging.error("Error getting checklist item: %s", e)
+            return None
+        if not item:
             return None
+        self._item_checklists.set(item_id, item['checklist_id'])
+        return item['checklist_id']
     
     def toggle_item(self, item_id: int, user_telegram_id: int) -> bool:
         """Toggle completion status of a checklist item."""
         try:
-            return self.db.toggle_checklist_item(item_id, user_telegram_id)
+            # Resolved before the write so the checklist is invalidated even when
+            # the item has dropped out of the index
+            checklist_id = self._item_checklists.get(item_id)
+            if checklist_id is None:
+                checklist_id = self._load_item_checklist_id(item_id)
+            toggled = self.db.toggle_checklist_item(item_id, user_telegram_id)
+            if toggled and checklist_id is not None:
+                self._invalidate(checklist_id)
+            return toggled
         except Exception as e:
-            logging.error(f"Error toggling checklist item: {e}")
+            logging.error("Error toggling checklist item: %s", e)
             return False
     
     async def add_item_to_checklist(self, checklist_id: int, item_text: str,
                                    user_telegram_id: int) -> Dict[str, Any]:
         """Add a new item to an existing checklist."""
-        try:
-            # Check if user has permission to modify this checklist
-            checklist = await self.get_checklist_by_id(checklist_id)
-            if not checklist:
-                return {
-                    'success': False,
-                    'message': 'Checklist not found'
-                }
-            
-            # Check if user is creator or shared user
-            user = self.db.get_user_by_telegram_id(user_telegram_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }
-            
-            user_id = user['id']
-            if checklist['created_by'] != user_id and checklist.get('shared_with') != user_id:
-                return {
-                    'success': False,
-                    'message': 'You do not have permission to modify this checklist'
-                }
-            
-            # Add the item
-            success = self.db.add_checklist_item(checklist_id, item_text.strip())
-            
-            if success:
-                logging.info(f"Item added to checklist {checklist_id} by user {user_telegram_id}")
-                return {
-                    'success': True,
-                    'message': 'Item added successfully'
-                }
-            else:
-                return {
-                    'success': False,
-                    'message': 'Failed to add item to checklist'
-                }
-                
-        except Exception as e:
-            logging.error(f"Error adding item to checklist: {e}")
+        # The creator or shared user may add items; the check is part of the INSERT itself
+        added = await asyncio.to_thread(self.db.add_checklist_item_if_permitted,
+                                        checklist_id, user_telegram_id, item_text.strip())
+        if added is None:
             return {
                 'success': False,
                 'message': 'An error occurred while adding the item'
             }
+        
+        if not added:
+            return await self._write_denied(checklist_id, user_telegram_id,
+                                            'You do not have permission to modify this checklist')
+        
+        self._invalidate(checklist_id)
+        logging.info("Item added to checklist %s by user %s", checklist_id, user_telegram_id)
+        
+        return {
+            'success': True,
+            'message': 'Item added successfully'
+        }
     
     async def remove_item_from_checklist(self, item_id: int, user_telegram_id: int) -> Dict[str, Any]:
         """Remove an item from a checklist."""
-        try:
-            # Get item and checklist info
-            # Get item and checklist info
-            item = self.db.get_checklist_item(item_id)
+        # Resolved before the row is gone so the checklist can be invalidated
+        checklist_id = await self.get_item_checklist_id(item_id)
+        # The creator or shared user may remove items; the check is part of the DELETE itself
+        removed = await asyncio.to_thread(self.db.remove_checklist_item_if_permitted,
+                                          item_id, user_telegram_id)
+        if removed is None:
+            return {
+                'success': False,
+                'message': 'An error occurred while removing the item'
+            }
+        
+        if not removed:
+            item = await asyncio.to_thread(self.db.get_checklist_item, item_id)
             if not item:
                 return {
                     'success': False,
                     'message': 'Item not found'
                 }
-            
-            checklist_id = item['checklist_id']
-            created_by = item['created_by']
-            shared_with = item['shared_with']
-            
-            # Check permissions
-            user = self.db.get_user_by_telegram_id(user_telegram_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }
-            
-            user_id = user['id']
-            if created_by != user_id and shared_with != user_id:
-                return {
-                    'success': False,
-                    'message': 'You do not have permission to modify this checklist'
-                }
-            
-            # Remove the item
-            if not self.db.remove_checklist_item(item_id):
-                 return {
-                    'success': False,
-                    'message': 'Failed to remove item'
-                }
-            
-            logging.info(f"Item {item_id} removed from checklist {checklist_id} by user {user_telegram_id}")
-            
-            return {
-                'success': True,
-                'message': 'Item removed successfully'
-            }
-            
-        except Exception as e:
-            logging.error(f"Error removing item from checklist: {e}")
+            return await self._write_denied(item['checklist_id'], user_telegram_id,
+                                            'You do not have permission to modify this checklist')
+        
+        self._item_checklists.pop(item_id)
+        if checklist_id is not None:
+            self._invalidate(checklist_id)
+        logging.info("Item %s removed from checklist %s by user %s", item_id, checklist_id, user_telegram_id)
+        
+        return {
+            'success': True,
+            'message': 'Item removed successfully'
+        }
+    
+    async def delete_checklist(self, checklist_id: int, user_telegram_id: int) -> Dict[str, Any]:
+        """Delete a checklist."""
+        # Only the creator may delete; the check is part of the DELETE itself
+        # (items are deleted due to CASCADE)
+        deleted = await asyncio.to_thread(self.db.delete_checklist_if_owner,
+                                          checklist_id, user_telegram_id)
+        if deleted is None:
             return {
                 'success': False,
-                'message': 'An error occurred while removing the item'
+                'message': 'An error occurred while deleting the checklist'
             }
+        
+        if not deleted:
+            return await self._write_denied(checklist_id, user_telegram_id,
+                                            'Only the creator can delete a checklist')
+        
+        self._invalidate(checklist_id)
+        logging.info("Checklist %s deleted by user %s", checklist_id, user_telegram_id)
+        
+        return {
+            'success': True,
+            'message': 'Checklist deleted successfully'
+        }
     
-    async def delete_checklist(self, checklist_id: int, user_telegram_id: int) -> Dict[str, Any]:
-        """Delete a checklist."""
-        try:
-            # Check if user has permission to delete this checklist
-            checklist = await self.get_checklist_by_id(checklist_id)
-            if not checklist:
-                return {
-                    'success': False,
-                    'message': 'Checklist not found'
-                }
-            
-            # Check if user is creator
-            user = self.db.get_user_by_telegram_id(user_telegram_id)
-            if not user:
-                return {
-                    'success': False,
-                    'message': 'User not found'
-                }
-            
-            if checklist['created_by'] != user['id']:
-                return {
-                    'success': False,
-                    'message': 'Only the creator can delete a checklist'
-                }
-            
-            # Delete checklist (items will be deleted due to CASCADE)
-            if not self.db.delete_checklist(checklist_id):
-                 return {
-                    'success': False,
-                    'message': 'Failed to delete checklist'
-                }
-            
-            logging.info(f"Checklist {checklist_id} deleted by user {user_telegram_id}")
-            
+    async def _write_denied(self, checklist_id: int, user_telegram_id: int,
+                            forbidden_message: str) -> Dict[str, Any]:
+        """Explain why an authorization-carrying write changed no rows."""
+        if not await asyncio.to_thread(self.db.get_checklist_auth_fields, checklist_id):
             return {
-                'success': True,
-                'message': 'Checklist deleted successfully'
+                'success': False,
+                'message': 'Checklist not found'
             }
-            
-        except Exception as e:
-            logging.error(f"Error deleting checklist: {e}")
+        
+        if await asyncio.to_thread(self.db.user_id_for_telegram, user_telegram_id) is None:
             return {
                 'success': False,
-                'message': 'An error occurred while deleting the checklist'
+                'message': 'User not found'
             }
+        
+        return {
+            'success': False,
+            'message': forbidden_message
+        }
     
     async def get_checklist_summary(self, checklist_id: int) -> str:
         """Get a formatted summary of a checklist."""
         try:
-            checklist = await self.get_checklist_by_id(checklist_id)
+            checklist = await self.get_checklist_with_items(checklist_id)
             if not checklist:
                 return "Checklist not found"
             
-            items = await self.get_checklist_items(checklist_id)
-            
-            summary = f"📋 **{checklist['title']}**\n"
-            if checklist.get('description'):
-                summary += f"📝 {checklist['description']}\n"
-            
-            summary += f"\n📊 Progress: {len([i for i in items if i['completed']])}/{len(items)} items completed\n\n"
-            
-            for item in items:
-                status = "✅" if item['completed'] else "⬜"
-                summary += f"{status} {item['text']}\n"
-                if item['completed'] and item.get('completed_by_name'):
-                    summary += f"   └ Completed by {item['completed_by_name']}\n"
-            
-            return summary
+            return self.format_checklist_summary(checklist)
             
         except Exception as e:
-            logging.error(f"Error getting checklist summary: {e}")
+            logging.error("Error getting checklist summary: %s", e)
             return "Error generating checklist summary"
     
+    @staticmethod
+    def format_checklist_summary(checklist: Checklist) -> str:
+        """Format a checklist fetched with its items as a summary message."""
+        items = checklist.items
+        parts = [f"📋 **{escape_md(checklist.title)}**\n"]
+        if checklist.description:
+            parts.append(f"📝 {escape_md(checklist.description)}\n")
+        
+        parts.append(f"\n📊 Progress: {sum(1 for i in items if i.completed)}/{len(items)} items completed\n\n")
+        
+        for item in items:
+            status = "✅" if item.completed else "⬜"
+            parts.append(f"{status} {escape_md(item.text)}\n")
+            if item.completed and item.completed_by_name:
+                parts.append(f"   └ Completed by {escape_md(item.completed_by_name)}\n")
+        
+        return "".join(parts)
+    
     async def export_checklist(self, checklist_id: int, format_type: str = 'text') -> str:
         """Export a checklist in various formats."""
         try:
-            checklist = await self.get_checklist_by_id(checklist_id)
+            checklist = await self.get_checklist_with_items(checklist_id)
             if not checklist:
                 return "Checklist not found"
             
-            items = await self.get_checklist_items(checklist_id)
-            
             if format_type == 'text':
-                export_text = f"📋 {checklist['title']}\n"
-                if checklist.get('description'):
-                    export_text += f"📝 {checklist['description']}\n"
-                export_text += "\n"
+                parts = [f"📋 {checklist.title}\n"]
+                if checklist.description:
+                    parts.append(f"📝 {checklist.description}\n")
+                parts.append("\n")
                 
-                for i, item in enumerate(items, 1):
-                    status = "[x]" if item['completed'] else "[ ]"
-                    export_text += f"{i}. {status} {item['text']}\n"
+                for i, item in enumerate(checklist.items, 1):
+                    status = "[x]" if item.completed else "[ ]"
+                    parts.append(f"{i}. {status} {item.text}\n")
                 
-                return export_text
+                return "".join(parts)
             
             elif format_type == 'markdown':
-                export_text = f"# {checklist['title']}\n\n"
-                if checklist.get('description'):
-                    export_text += f"{checklist['description']}\n\n"
+                parts = [f"# {checklist.title}\n\n"]
+                if checklist.description:
+                    parts.append(f"{checklist.description}\n\n")
                 
-                for item in items:
-                    status = "- [x]" if item['completed'] else "- [ ]"
-                    export_text += f"{status} {item['text']}\n"
+                for item in checklist.items:
+                    status = "- [x]" if item.completed else "- [ ]"
+                    parts.append(f"{status} {item.text}\n")
                 
-                return export_text
+                return "".join(parts)
             
             return "Export format not supported"
             
         except Exception as e:
-            logging.error(f"Error exporting checklist: {e}")
+            logging.error("Error exporting checklist: %s", e)
             return "Error exporting checklist"
     
     async def get_completion_stats(self, user_telegram_id: int) -> Dict[str, Any]:
         """Get completion statistics for a user's checklists."""
         try:
-            checklists = await self.get_user_checklists(user_telegram_id)
-            
-            total_checklists = len(checklists)
-            total_items = sum(cl['total_items'] for cl in checklists)
-            completed_items = sum(cl['completed_items'] for cl in checklists)
-            completed_checklists = len([cl for cl in checklists if cl['completion_percentage'] == 100])
-            
-            return {
-                'total_checklists': total_checklists,
-                'completed_checklists': completed_checklists,
-                'total_items': total_items,
-                'completed_items': completed_items,
-                'overall_completion_percentage': (
-                    (completed_items / total_items * 100) if total_items > 0 else 0
-                )
-            }
+            # Only the four totals come back from the database
+            stats = await asyncio.to_thread(self.db.get_user_completion_stats, user_telegram_id)
+            if stats is None:
+                raise RuntimeError("completion stats query failed")
+            
+            total_items = stats['total_items']
+            stats['overall_completion_percentage'] = (
+                (stats['completed_items'] / total_items * 100) if total_items > 0 else 0
+            )
+            return stats
             
         except Exception as e:
-            logging.error(f"Error getting completion stats: {e}")
+            logging.error("Error getting completion stats: %s", e)
             return {
                 'total_checklists': 0,
                 'completed_checklists': 0,
@@ -0,0 +1,43 @@
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True)
+class Config:
+    """Bot settings read once from the environment at startup."""
+    
+    # Declared by hand because dataclass(slots=True) needs Python 3.10
+    __slots__ = ('db_path', 'gemini_key', 'telegram_token', 'debug_mode', 'log_level', 'log_file',
+                 'semantic_cache_enabled')
+    
+    db_path: str
+    gemini_key: str
+    telegram_token: str
+    debug_mode: bool
+    log_level: int
+    log_file: str
+    semantic_cache_enabled: bool
+    
+    @classmethod
+    def from_env(cls) -> 'Config':
+        """Build the configuration from environment variables."""
+        return cls(
+            db_path=os.getenv('DATABASE_PATH', 'data/cupidgpt.db'),
+            gemini_key=os.getenv('GEMINI_API_KEY'),
+            telegram_token=os.getenv('TELEGRAM_BOT_TOKEN'),
+            debug_mode=os.getenv('DEBUG_MODE', 'false').lower() == 'true',
+            log_level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper()),
+            log_file=os.getenv('LOG_FILE', 'logs/cupidgpt.log'),
+            semantic_cache_enabled=os.getenv('SEMANTIC_CACHE_ENABLED', 'false').lower() == 'true',
+        )
+
+
+@lru_cache(maxsize=None)
+def load_config() -> Config:
+    """Load .env and read the configuration once per process."""
+    load_dotenv()
+    return Config.from_env()
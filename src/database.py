@@ -1,20 +1,315 @@
 import sqlite3
 import logging
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, ContextManager, Iterator, Tuple
+from datetime import datetime, timedelta
+
+
+# Store datetimes as 'YYYY-MM-DD HH:MM:SS' so readers can slice the fields directly
+# instead of re-parsing (and so the layout doesn't depend on the deprecated
+# default adapter)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' ', 'seconds'))
+
+
+@dataclass(frozen=True)
+class ChecklistItem:
+    """A checklist item row, in the column order selected by get_latest_checklist_with_items."""
+    
+    # Declared by hand since dataclass(slots=True) needs Python 3.10
+    __slots__ = ('id', 'checklist_id', 'text', 'completed', 'completed_by',
+                 'completed_at', 'created_at', 'completed_by_name')
+    
+    id: int
+    checklist_id: int
+    text: str
+    completed: bool
+    completed_by: Optional[int]
+    completed_at: Optional[str]
+    created_at: str
+    completed_by_name: Optional[str]
+
+
+@dataclass(frozen=True)
+class Checklist:
+    """A checklist row together with its items."""
+    
+    __slots__ = ('id', 'title', 'description', 'created_by', 'shared_with',
+                 'created_at', 'creator_name', 'items')
+    
+    id: int
+    title: str
+    description: Optional[str]
+    created_by: int
+    shared_with: Optional[int]
+    created_at: str
+    creator_name: Optional[str]
+    items: Tuple[ChecklistItem, ...]
+
+
+# Fixed SQL text for the hot appointment queries, so each one is parsed once and
+# then served from the connection's statement cache
+_SQL_GET_BY_ID = """
+    SELECT a.*, u.first_name as creator_name
+    FROM appointments a
+    JOIN users u ON a.created_by = u.id
+    WHERE a.id = ?
+"""
+
+_SQL_GET_FOR_USER = """
+    SELECT a.*, u.first_name as creator_name
+    FROM appointments a
+    JOIN users u ON a.created_by = u.id
+    WHERE (a.created_by = ? OR a.shared_with = ?)
+    ORDER BY a.appointment_date ASC
+    LIMIT ?
+"""
+
+_SQL_GET_UPCOMING_FOR_USER = """
+    SELECT a.*, u.first_name as creator_name
+    FROM appointments a
+    JOIN users u ON a.created_by = u.id
+    WHERE (a.created_by = ? OR a.shared_with = ?)
+    AND a.appointment_date >= ?
+    ORDER BY a.appointment_date ASC
+    LIMIT ?
+"""
+
+_SQL_GET_FOR_DATE = """
+    SELECT a.*, u.first_name as creator_name
+    FROM appointments a
+    JOIN users u ON a.created_by = u.id
+    WHERE (a.created_by = ? OR a.shared_with = ?)
+    AND a.appointment_date >= ? AND a.appointment_date < ?
+    ORDER BY a.appointment_date ASC
+"""
+
+_SQL_CONFLICTS = """
+    SELECT a.*, u.first_name as creator_name
+    FROM appointments a
+    JOIN users u ON a.created_by = u.id
+    WHERE (a.created_by = ? OR a.shared_with = ?)
+    AND a.appointment_date < ? AND a.end_date > ?
+    ORDER BY a.appointment_date ASC
+"""
+
+# A checklist row joined with each of its items (item columns are NULL for an empty checklist);
+# {where} selects the checklist id
+_SQL_CHECKLIST_WITH_ITEMS = """
+    SELECT c.id, c.title, c.description, c.created_by, c.shared_with,
+           c.created_at, cu.first_name as creator_name,
+           ci.id as item_id, ci.checklist_id, ci.text, ci.completed,
+           ci.completed_by, ci.completed_at, ci.created_at as item_created_at,
+           u.first_name as completed_by_name
+    FROM checklists c
+    JOIN users cu ON c.created_by = cu.id
+    LEFT JOIN checklist_items ci ON ci.checklist_id = c.id
+    LEFT JOIN users u ON ci.completed_by = u.id
+    WHERE c.id = {where}
+    ORDER BY ci.created_at ASC, ci.id ASC
+"""
+
+_SQL_LATEST_CHECKLIST_WITH_ITEMS = _SQL_CHECKLIST_WITH_ITEMS.format(where="""(
+        SELECT id FROM checklists
+        WHERE created_by = ? OR shared_with = ?
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
+    )""")
+
+_SQL_CHECKLIST_WITH_ITEMS_BY_ID = _SQL_CHECKLIST_WITH_ITEMS.format(where='?')
+
+# Checklist statements on the summary/toggle/delete paths, kept as one string object each
+# so every call is a hit in the connection's prepared-statement cache
+_SQL_CHECKLIST_BY_ID = """
+    SELECT c.*, u.first_name as creator_name
+    FROM checklists c
+    JOIN users u ON c.created_by = u.id
+    WHERE c.id = ?
+"""
+
+_SQL_CHECKLIST_ITEMS = """
+    SELECT ci.*, u.first_name as completed_by_name
+    FROM checklist_items ci
+    LEFT JOIN users u ON ci.completed_by = u.id
+    WHERE ci.checklist_id = ?
+    ORDER BY ci.created_at ASC
+"""
+
+_SQL_CHECKLIST_ITEM = """
+    SELECT ci.*, ci.checklist_id, c.created_by, c.shared_with
+    FROM checklist_items ci
+    JOIN checklists c ON ci.checklist_id = c.id
+    WHERE ci.id = ?
+"""
+
+_SQL_DELETE_CHECKLIST = "DELETE FROM checklists WHERE id = ?"
+
+_SQL_DELETE_CHECKLIST_ITEM = "DELETE FROM checklist_items WHERE id = ?"
+
+# Authorization-carrying writes: the user (by telegram id) must be the creator or,
+# where sharing applies, the partner the checklist is shared with
+_SQL_DELETE_CHECKLIST_IF_OWNER = """
+    DELETE FROM checklists
+    WHERE id = ? AND created_by = (SELECT id FROM users WHERE telegram_id = ?)
+"""
+
+_SQL_ADD_CHECKLIST_ITEM_IF_PERMITTED = """
+    INSERT INTO checklist_items (checklist_id, text)
+    SELECT c.id, ?
+    FROM checklists c
+    JOIN users u ON u.telegram_id = ?
+    WHERE c.id = ? AND (c.created_by = u.id OR c.shared_with = u.id)
+"""
+
+_SQL_REMOVE_CHECKLIST_ITEM_IF_PERMITTED = """
+    DELETE FROM checklist_items
+    WHERE id = ? AND checklist_id IN (
+        SELECT c.id
+        FROM checklists c
+        JOIN users u ON u.telegram_id = ?
+        WHERE c.created_by = u.id OR c.shared_with = u.id
+    )
+"""
+
+_UPDATABLE_FIELDS = ('title', 'description', 'appointment_date', 'location')
+
+# UPDATE statements keyed by (updated fields in _UPDATABLE_FIELDS order, permission-checked);
+# there are at most 2 * 15 of them, so each is built once and then hits the statement cache
+_UPDATE_SQL_CACHE: Dict[Tuple[Tuple[str, ...], bool], str] = {}
+
+
+def _update_sql(fields: Tuple[str, ...], if_permitted: bool) -> str:
+    """Get the UPDATE statement for a set of fields.
+    
+    Field values bind to ?1..?n and the appointment id to ?n+1; the permitted
+    variant also binds the Telegram ID to ?n+2 and skips rows that already hold
+    the requested values.
+    """
+    key = (fields, if_permitted)
+    sql = _UPDATE_SQL_CACHE.get(key)
+    if sql is None:
+        assignments = [f"{field} = ?{i}" for i, field in enumerate(fields, 1)]
+        if 'appointment_date' in fields:
+            assignments.append(
+                f"end_date = datetime(?{fields.index('appointment_date') + 1}, "
+                "'+' || COALESCE(duration_minutes, 60) || ' minutes')"
+            )
+        id_param = len(fields) + 1
+        sql = f"UPDATE appointments SET {', '.join(assignments)} WHERE id = ?{id_param}"
+        if if_permitted:
+            tg_param = id_param + 1
+            changed = ' OR '.join(f"{field} IS NOT ?{i}" for i, field in enumerate(fields, 1))
+            sql += (f" AND (created_by = (SELECT id FROM users WHERE telegram_id = ?{tg_param})"
+                    f" OR shared_with = (SELECT id FROM users WHERE telegram_id = ?{tg_param}))"
+                    f" AND ({changed})")
+        sql = _UPDATE_SQL_CACHE.setdefault(key, sql)
+    return sql
 
 
 class DatabaseManager:
     """Manages SQLite database operations for the CupidGPT bot."""
     
+    # Shared instances keyed by database path, see for_path()
+    _instances: Dict[str, 'DatabaseManager'] = {}
+    
+    # Upper bound for the telegram_id -> user id cache
+    _USER_ID_CACHE_SIZE = 8192
+    
+    # Connections shared by worker threads, see _connect()
+    POOL_SIZE = 4
+    
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self._tg_to_uid: 'OrderedDict[int, int]' = OrderedDict()
+        self._idle: 'queue.Queue[sqlite3.Connection]' = queue.Queue()
+        self._conns: List[sqlite3.Connection] = []
+        self._local = threading.local()
+        self._lock = threading.RLock()
         self.init_database()
     
+    @classmethod
+    def for_path(cls, db_path: str) -> 'DatabaseManager':
+        """Return the shared manager for a database path, creating it on first use.
+        
+        The schema is only initialized once per path and process; construct
+        DatabaseManager directly to get a fresh, independent instance.
+        """
+        instance = cls._instances.get(db_path)
+        if instance is None:
+            instance = cls._instances[db_path] = cls(db_path)
+        return instance
+    
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a connection with the pragmas every pooled connection uses."""
+        # timeout is SQLite's busy timeout: wait up to 5s for another connection's write lock
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=256, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        # WAL lets readers run alongside the writer; with it, NORMAL only
+        # fsyncs at checkpoints, which is durable enough for a chat bot
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        return conn
+    
+    def _acquire(self) -> sqlite3.Connection:
+        """Take an idle connection, opening a new one while the pool is below POOL_SIZE."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._conns) < self.POOL_SIZE:
+                conn = self._open_connection()
+                self._conns.append(conn)
+                return conn
+        return self._idle.get()
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Yield a pooled connection for the calling thread.
+        
+        Connections are opened on demand (up to POOL_SIZE) and kept for the
+        lifetime of the manager, so concurrent worker threads don't queue behind
+        one connection. Like ``with sqlite3.connect(...)``, the block is committed
+        on success and rolled back on error. A nested call from the same thread
+        reuses the outer connection and leaves the transaction to the outer block.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._local.conn = None
+            self._idle.put(conn)
+    
+    def connection(self) -> ContextManager[sqlite3.Connection]:
+        """Pooled connection context (see _connect) for managers that run their own SQL."""
+        return self._connect()
+    
+    def close(self):
+        """Close every pooled connection."""
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+            self._idle = queue.Queue()
+    
     def init_database(self):
         """Initialize the database with required tables."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Users table
@@ -39,6 +334,8 @@ class DatabaseManager:
                         description TEXT,
                         appointment_date TIMESTAMP NOT NULL,
                         location TEXT,
+                        duration_minutes INTEGER DEFAULT 60,
+                        end_date TIMESTAMP,
                         created_by INTEGER NOT NULL,
                         shared_with INTEGER,
                         reminder_sent BOOLEAN DEFAULT FALSE,
@@ -77,6 +374,52 @@ class DatabaseManager:
                     )
                 """)
                 
+                # Migrations for databases created before a column existed
+                cursor.execute("PRAGMA table_info(appointments)")
+                appointment_columns = {row[1] for row in cursor.fetchall()}
+                if 'duration_minutes' not in appointment_columns:
+                    cursor.execute(
+                        "ALTER TABLE appointments ADD COLUMN duration_minutes INTEGER DEFAULT 60"
+                    )
+                if 'end_date' not in appointment_columns:
+                    cursor.execute("ALTER TABLE appointments ADD COLUMN end_date TIMESTAMP")
+                    cursor.execute("""
+                        UPDATE appointments
+                        SET end_date = datetime(appointment_date,
+                                                '+' || COALESCE(duration_minutes, 60) || ' minutes')
+                    """)
+                
+                # Indexes
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_appt_user_date
+                    ON appointments (created_by, appointment_date)
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_appt_shared_date
+                    ON appointments (shared_with, appointment_date)
+                """)
+                # Serves both the checklist_id filter and the created_at order of item reads
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_items_checklist_created
+                    ON checklist_items (checklist_id, created_at)
+                """)
+                # Checklist lists filter on created_by OR shared_with, newest first
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_checklists_user_created
+                    ON checklists (created_by, created_at)
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_checklists_shared_created
+                    ON checklists (shared_with, created_at)
+                """)
+                
+                # Gather planner statistics once; later startups only refresh stale ones
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+                if cursor.fetchone() is None:
+                    cursor.execute("ANALYZE")
+                else:
+                    cursor.execute("PRAGMA optimize")
+                
                 conn.commit()
                 logging.info("Database initialized successfully")
                 
@@ -88,7 +431,7 @@ class DatabaseManager:
                  first_name: str = None, last_name: str = None) -> bool:
         """Add a new user to the database."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # First, try to insert the user (will be ignored if telegram_id already exists)
@@ -115,8 +458,7 @@ class DatabaseManager:
     def get_user_by_telegram_id(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         """Get user by Telegram ID."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT * FROM users WHERE telegram_id = ?", (telegram_id,))
                 row = cursor.fetchone()
@@ -125,10 +467,38 @@ class DatabaseManager:
             logging.error(f"Error getting user: {e}")
             return None
     
+    def user_id_for_telegram(self, telegram_id: int) -> Optional[int]:
+        """Get the internal user ID for a Telegram ID, cached after the first lookup."""
+        cache = self._tg_to_uid
+        with self._lock:
+            user_id = cache.get(telegram_id)
+            if user_id is not None:
+                cache.move_to_end(telegram_id)
+                return user_id
+        
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
+                row = cursor.fetchone()
+        except sqlite3.Error as e:
+            logging.error(f"Error getting user ID: {e}")
+            return None
+        
+        if not row:
+            return None
+        
+        # The mapping never changes for a registered user; evict least recently used
+        with self._lock:
+            cache[telegram_id] = row[0]
+            if len(cache) > self._USER_ID_CACHE_SIZE:
+                cache.popitem(last=False)
+        return row[0]
+    
     def pair_users(self, user1_telegram_id: int, user2_telegram_id: int) -> bool:
         """Pair two users together."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Get user IDs
@@ -156,8 +526,7 @@ class DatabaseManager:
     def get_paired_user(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         """Get the paired user for a given user."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     SELECT u2.* FROM users u1
@@ -171,10 +540,11 @@ class DatabaseManager:
             return None
     
     def create_appointment(self, title: str, description: str, appointment_date: datetime,
-                          location: str, created_by_telegram_id: int) -> Optional[int]:
+                          location: str, created_by_telegram_id: int,
+                          duration_minutes: int = 60) -> Optional[int]:
         """Create a new appointment."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Get user ID and paired user ID
@@ -188,9 +558,12 @@ class DatabaseManager:
                 
                 cursor.execute("""
                     INSERT INTO appointments 
-                    (title, description, appointment_date, location, created_by, shared_with)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (title, description, appointment_date, location, created_by_id, shared_with_id))
+                    (title, description, appointment_date, location, duration_minutes,
+                     end_date, created_by, shared_with)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (title, description, appointment_date, location, duration_minutes,
+                      appointment_date + timedelta(minutes=duration_minutes),
+                      created_by_id, shared_with_id))
                 
                 appointment_id = cursor.lastrowid
                 conn.commit()
@@ -199,46 +572,66 @@ class DatabaseManager:
             logging.error(f"Error creating appointment: {e}")
             return None
     
-    def get_appointments(self, telegram_id: int, upcoming_only: bool = True) -> List[Dict[str, Any]]:
-        """Get appointments for a user."""
+    def get_appointments(self, telegram_id: int, upcoming_only: bool = True,
+                         limit: Optional[int] = None,
+                         now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get appointments for a user, at most ``limit`` of them when given.
+        
+        Upcoming means at or after ``now`` (local time, defaults to the current time).
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            user_id = self.user_id_for_telegram(telegram_id)
+            if user_id is None:
+                return []
+            
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
-                # Get user ID
-                cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
-                user_result = cursor.fetchone()
-                if not user_result:
-                    return []
-                
-                user_id = user_result[0]
-                
-                query = """
-                    SELECT a.*, u.first_name as creator_name
-                    FROM appointments a
-                    JOIN users u ON a.created_by = u.id
-                    WHERE (a.created_by = ? OR a.shared_with = ?)
-                """
-                params = [user_id, user_id]
-                
+                # Appointment dates are stored in local time, so compare against
+                # the local clock rather than SQLite's UTC datetime('now')
+                if limit is None:
+                    limit = -1
                 if upcoming_only:
-                    query += " AND a.appointment_date >= datetime('now')"
-                
-                query += " ORDER BY a.appointment_date ASC"
-                
-                cursor.execute(query, params)
+                    now = now or datetime.now()
+                    cursor.execute(_SQL_GET_UPCOMING_FOR_USER,
+                                   (user_id, user_id, now.isoformat(' ', 'seconds'), limit))
+                else:
+                    cursor.execute(_SQL_GET_FOR_USER, (user_id, user_id, limit))
                 rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(dict, rows))
         except sqlite3.Error as e:
             logging.error(f"Error getting appointments: {e}")
             return []
     
+    def iter_appointments(self, user_id: int, upcoming_only: bool = False,
+                          batch_size: int = 200) -> Iterator[sqlite3.Row]:
+        """Yield a user's appointments in date order, fetching batch_size rows at a time.
+        
+        The connection stays locked until the generator is exhausted or closed,
+        so consume it without awaiting in between.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                if upcoming_only:
+                    cursor.execute(_SQL_GET_UPCOMING_FOR_USER,
+                                   (user_id, user_id, datetime.now().isoformat(' ', 'seconds'), -1))
+                else:
+                    cursor.execute(_SQL_GET_FOR_USER, (user_id, user_id, -1))
+                
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+        except sqlite3.Error as e:
+            logging.error(f"Error iterating appointments: {e}")
+    
     def create_checklist(self, title: str, description: str, 
                         created_by_telegram_id: int) -> Optional[int]:
         """Create a new checklist."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
                 # Get user ID and paired user ID
@@ -265,7 +658,7 @@ class DatabaseManager:
     def add_checklist_item(self, checklist_id: int, text: str) -> bool:
         """Add an item to a checklist."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     INSERT INTO checklist_items (checklist_id, text)
@@ -277,21 +670,32 @@ class DatabaseManager:
             logging.error(f"Error adding checklist item: {e}")
             return False
     
+    def add_checklist_items_bulk(self, checklist_id: int, texts: List[str]) -> List[str]:
+        """Add several items to a checklist in one transaction.
+        
+        Returns the texts that were added: all of them, or none if the insert failed.
+        """
+        try:
+            with self._connect() as conn:
+                conn.executemany("""
+                    INSERT INTO checklist_items (checklist_id, text)
+                    VALUES (?, ?)
+                """, [(checklist_id, text) for text in texts])
+                return list(texts)
+        except sqlite3.Error as e:
+            logging.error(f"Error adding checklist items: {e}")
+            return []
+    
     def get_checklists(self, telegram_id: int) -> List[Dict[str, Any]]:
         """Get checklists for a user."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            user_id = self.user_id_for_telegram(telegram_id)
+            if user_id is None:
+                return []
+            
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
-                # Get user ID
-                cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
-                user_result = cursor.fetchone()
-                if not user_result:
-                    return []
-                
-                user_id = user_result[0]
-                
                 cursor.execute("""
                     SELECT c.*, u.first_name as creator_name
                     FROM checklists c
@@ -301,45 +705,127 @@ class DatabaseManager:
                 """, (user_id, user_id))
                 
                 rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(dict, rows))
         except sqlite3.Error as e:
             logging.error(f"Error getting checklists: {e}")
             return []
     
-    def get_checklist_items(self, checklist_id: int) -> List[Dict[str, Any]]:
-        """Get items for a checklist."""
+    def get_checklists_with_stats(self, telegram_id: int) -> List[Dict[str, Any]]:
+        """Get checklists for a user with total_items and completed_items counted in the same query."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            user_id = self.user_id_for_telegram(telegram_id)
+            if user_id is None:
+                return []
+            
+            with self._connect() as conn:
                 cursor = conn.cursor()
+                
                 cursor.execute("""
-                    SELECT ci.*, u.first_name as completed_by_name
-                    FROM checklist_items ci
-                    LEFT JOIN users u ON ci.completed_by = u.id
-                    WHERE ci.checklist_id = ?
-                    ORDER BY ci.created_at ASC
-                """, (checklist_id,))
+                    SELECT c.*, u.first_name as creator_name,
+                           COUNT(ci.id) as total_items,
+                           COALESCE(SUM(ci.completed), 0) as completed_items
+                    FROM checklists c
+                    JOIN users u ON c.created_by = u.id
+                    LEFT JOIN checklist_items ci ON ci.checklist_id = c.id
+                    WHERE (c.created_by = ? OR c.shared_with = ?)
+                    GROUP BY c.id
+                    ORDER BY c.created_at DESC
+                """, (user_id, user_id))
                 
                 rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(dict, rows))
+        except sqlite3.Error as e:
+            logging.error(f"Error getting checklists with stats: {e}")
+            return []
+    
+    def get_user_completion_stats(self, telegram_id: int) -> Optional[Dict[str, int]]:
+        """Get checklist and item totals over a user's checklists, aggregated in SQL.
+        
+        Returns total_checklists, completed_checklists (with at least one item, all
+        completed), total_items and completed_items, or None on a database error.
+        """
+        try:
+            user_id = self.user_id_for_telegram(telegram_id)
+            if user_id is None:
+                return {'total_checklists': 0, 'completed_checklists': 0,
+                        'total_items': 0, 'completed_items': 0}
+            
+            with self._connect() as conn:
+                row = conn.execute("""
+                    SELECT COUNT(*) as total_checklists,
+                           COALESCE(SUM(total > 0 AND done = total), 0) as completed_checklists,
+                           COALESCE(SUM(total), 0) as total_items,
+                           COALESCE(SUM(done), 0) as completed_items
+                    FROM (
+                        SELECT COUNT(ci.id) as total, COALESCE(SUM(ci.completed), 0) as done
+                        FROM checklists c
+                        LEFT JOIN checklist_items ci ON ci.checklist_id = c.id
+                        WHERE c.created_by = ? OR c.shared_with = ?
+                        GROUP BY c.id
+                    )
+                """, (user_id, user_id)).fetchone()
+                return dict(row)
+        except sqlite3.Error as e:
+            logging.error(f"Error getting completion stats: {e}")
+            return None
+    
+    def get_checklist_items(self, checklist_id: int) -> List[Dict[str, Any]]:
+        """Get items for a checklist."""
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(_SQL_CHECKLIST_ITEMS, (checklist_id,)).fetchall()
+                return list(map(dict, rows))
         except sqlite3.Error as e:
             logging.error(f"Error getting checklist items: {e}")
             return []
     
+    def get_latest_checklist_with_items(self, telegram_id: int) -> Optional[Checklist]:
+        """Get the user's most recent checklist together with its items in one query.
+        
+        Returns None if the user has no checklists.
+        """
+        try:
+            user_id = self.user_id_for_telegram(telegram_id)
+            if user_id is None:
+                return None
+            
+            with self._connect() as conn:
+                rows = conn.execute(_SQL_LATEST_CHECKLIST_WITH_ITEMS, (user_id, user_id)).fetchall()
+                return self._checklist_from_rows(rows)
+        except sqlite3.Error as e:
+            logging.error(f"Error getting latest checklist with items: {e}")
+            return None
+    
+    def get_checklist_with_items(self, checklist_id: int) -> Optional[Checklist]:
+        """Get a checklist together with its items in one query, or None if it does not exist."""
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(_SQL_CHECKLIST_WITH_ITEMS_BY_ID, (checklist_id,)).fetchall()
+                return self._checklist_from_rows(rows)
+        except sqlite3.Error as e:
+            logging.error(f"Error getting checklist with items: {e}")
+            return None
+    
+    @staticmethod
+    def _checklist_from_rows(rows) -> Optional[Checklist]:
+        """Build a Checklist from _SQL_CHECKLIST_WITH_ITEMS rows."""
+        if not rows:
+            return None
+        
+        # Checklist columns are the first 7; the rest describe one item (all NULL if none)
+        items = tuple(ChecklistItem(*row[7:]) for row in rows if row[7] is not None)
+        return Checklist(*rows[0][:7], items)
+    
     def toggle_checklist_item(self, item_id: int, telegram_id: int) -> bool:
         """Toggle completion status of a checklist item."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            user_id = self.user_id_for_telegram(telegram_id)
+            if user_id is None:
+                return False
+            
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 
-                # Get user ID
-                cursor.execute("SELECT id FROM users WHERE telegram_id = ?", (telegram_id,))
-                user_result = cursor.fetchone()
-                if not user_result:
-                    return False
-                
-                user_id = user_result[0]
-                
                 # Get current status
                 cursor.execute("SELECT completed FROM checklist_items WHERE id = ?", (item_id,))
                 result = cursor.fetchone()
@@ -373,8 +859,7 @@ class DatabaseManager:
     def get_upcoming_appointments_for_reminders(self, minutes_ahead: int = 60) -> List[Dict[str, Any]]:
         """Get appointments that need reminders sent."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     SELECT a.*, 
@@ -390,7 +875,7 @@ class DatabaseManager:
                 """.format(minutes_ahead))
                 
                 rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(dict, rows))
         except sqlite3.Error as e:
             logging.error(f"Error getting appointments for reminders: {e}")
             return []
@@ -398,7 +883,7 @@ class DatabaseManager:
     def mark_reminder_sent(self, appointment_id: int) -> bool:
         """Mark an appointment reminder as sent."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     UPDATE appointments SET reminder_sent = TRUE WHERE id = ?
@@ -412,15 +897,9 @@ class DatabaseManager:
     def get_appointment_by_id(self, appointment_id: int) -> Optional[Dict[str, Any]]:
         """Get a specific appointment by ID."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT a.*, u.first_name as creator_name
-                    FROM appointments a
-                    JOIN users u ON a.created_by = u.id
-                    WHERE a.id = ?
-                """, (appointment_id,))
+                cursor.execute(_SQL_GET_BY_ID, (appointment_id,))
                 
                 row = cursor.fetchone()
                 return dict(row) if row else None
@@ -431,26 +910,14 @@ class DatabaseManager:
     def update_appointment(self, appointment_id: int, updates: Dict[str, Any]) -> bool:
         """Update an appointment."""
         try:
-            if not updates:
+            fields = tuple(field for field in _UPDATABLE_FIELDS if field in updates)
+            if not fields:
                 return False
-
-            update_fields = []
-            update_values = []
             
-            for field, value in updates.items():
-                if field in ['title', 'description', 'appointment_date', 'location']:
-                    update_fields.append(f"{field} = ?")
-                    update_values.append(value)
-            
-            if not update_fields:
-                return False
-            
-            update_values.append(appointment_id)
-            
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                query = f"UPDATE appointments SET {', '.join(update_fields)} WHERE id = ?"
-                cursor.execute(query, update_values)
+                cursor.execute(_update_sql(fields, False),
+                               [updates[field] for field in fields] + [appointment_id])
                 conn.commit()
                 return True
         except sqlite3.Error as e:
@@ -460,7 +927,7 @@ class DatabaseManager:
     def delete_appointment(self, appointment_id: int) -> bool:
         """Delete an appointment."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
                 cursor.execute("DELETE FROM appointments WHERE id = ?", (appointment_id,))
                 conn.commit()
@@ -469,41 +936,100 @@ class DatabaseManager:
             logging.error(f"Error deleting appointment: {e}")
             return False
 
+    def update_appointment_if_permitted(self, appointment_id: int, telegram_id: int,
+                                        updates: Dict[str, Any]) -> Optional[int]:
+        """Update an appointment if the user created it or it is shared with them.
+        
+        Authorization is evaluated inside the UPDATE itself, and rows whose fields
+        already hold the requested values are left untouched. Returns the number of
+        rows changed (0 when the appointment is missing, not permitted or unchanged)
+        or None on a database error. Fields missing from ``updates`` are left as is.
+        """
+        try:
+            fields = tuple(field for field in _UPDATABLE_FIELDS if field in updates)
+            if not fields:
+                return 0
+            
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(_update_sql(fields, True),
+                               [updates[field] for field in fields] + [appointment_id, telegram_id])
+                conn.commit()
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logging.error(f"Error updating appointment: {e}")
+            return None
+
+    def delete_appointment_if_owner(self, appointment_id: int, telegram_id: int) -> Optional[int]:
+        """Delete an appointment if the user created it.
+        
+        Returns the number of rows deleted (0 when the appointment is missing or
+        the user is not its creator), or None on a database error.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    DELETE FROM appointments
+                    WHERE id = ? AND created_by = (SELECT id FROM users WHERE telegram_id = ?)
+                """, (appointment_id, telegram_id))
+                conn.commit()
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logging.error(f"Error deleting appointment: {e}")
+            return None
+
+    def get_appointment_auth_fields(self, appointment_id: int) -> Optional[Tuple[int, Optional[int]]]:
+        """Get ``(created_by, shared_with)`` for an appointment, or None if it doesn't exist.
+        
+        Reads only the appointments primary key; use get_appointment_by_id when
+        display fields such as creator_name are needed.
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT created_by, shared_with FROM appointments WHERE id = ?",
+                               (appointment_id,))
+                row = cursor.fetchone()
+                return tuple(row) if row else None
+        except sqlite3.Error as e:
+            logging.error(f"Error getting appointment auth fields: {e}")
+            return None
+
     def get_appointments_in_range(self, user_id: int, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
         """Get appointments within a specific date range."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT a.*, u.first_name as creator_name
-                    FROM appointments a
-                    JOIN users u ON a.created_by = u.id
-                    WHERE (a.created_by = ? OR a.shared_with = ?)
-                    AND a.appointment_date >= ? AND a.appointment_date < ?
-                    ORDER BY a.appointment_date ASC
-                """, (user_id, user_id, start_date.isoformat(), end_date.isoformat()))
+                cursor.execute(_SQL_GET_FOR_DATE,
+                               (user_id, user_id, start_date.isoformat(' '), end_date.isoformat(' ')))
                 
                 rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(dict, rows))
         except sqlite3.Error as e:
             logging.error(f"Error getting appointments in range: {e}")
             return []
 
-    def get_checklist_by_id(self, checklist_id: int) -> Optional[Dict[str, Any]]:
-        """Get a specific checklist by ID."""
+    def get_conflicting_appointments(self, user_id: int, start_time: datetime,
+                                     end_time: datetime) -> List[Dict[str, Any]]:
+        """Get appointments overlapping the given time window."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT c.*, u.first_name as creator_name
-                    FROM checklists c
-                    JOIN users u ON c.created_by = u.id
-                    WHERE c.id = ?
-                """, (checklist_id,))
+                cursor.execute(_SQL_CONFLICTS,
+                               (user_id, user_id, end_time.isoformat(' '), start_time.isoformat(' ')))
                 
-                row = cursor.fetchone()
+                rows = cursor.fetchall()
+                return list(map(dict, rows))
+        except sqlite3.Error as e:
+            logging.error(f"Error getting conflicting appointments: {e}")
+            return []
+
+    def get_checklist_by_id(self, checklist_id: int) -> Optional[Dict[str, Any]]:
+        """Get a specific checklist by ID."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(_SQL_CHECKLIST_BY_ID, (checklist_id,)).fetchone()
                 return dict(row) if row else None
         except sqlite3.Error as e:
             logging.error(f"Error getting checklist by ID: {e}")
@@ -512,28 +1038,70 @@ class DatabaseManager:
     def delete_checklist(self, checklist_id: int) -> bool:
         """Delete a checklist."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM checklists WHERE id = ?", (checklist_id,))
-                conn.commit()
+            with self._connect() as conn:
+                conn.execute(_SQL_DELETE_CHECKLIST, (checklist_id,))
                 return True
         except sqlite3.Error as e:
             logging.error(f"Error deleting checklist: {e}")
             return False
 
+    def get_checklist_auth_fields(self, checklist_id: int) -> Optional[Tuple[int, Optional[int]]]:
+        """Get ``(created_by, shared_with)`` for a checklist, or None if it doesn't exist."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT created_by, shared_with FROM checklists WHERE id = ?",
+                                   (checklist_id,)).fetchone()
+                return tuple(row) if row else None
+        except sqlite3.Error as e:
+            logging.error(f"Error getting checklist auth fields: {e}")
+            return None
+
+    def delete_checklist_if_owner(self, checklist_id: int, telegram_id: int) -> Optional[int]:
+        """Delete a checklist if the user created it.
+        
+        Returns the number of rows deleted (0 when the checklist is missing or
+        the user is not its creator), or None on a database error.
+        """
+        try:
+            with self._connect() as conn:
+                return conn.execute(_SQL_DELETE_CHECKLIST_IF_OWNER, (checklist_id, telegram_id)).rowcount
+        except sqlite3.Error as e:
+            logging.error(f"Error deleting checklist: {e}")
+            return None
+
+    def add_checklist_item_if_permitted(self, checklist_id: int, telegram_id: int,
+                                        text: str) -> Optional[int]:
+        """Add an item to a checklist if the user created it or it is shared with them.
+        
+        Returns the number of rows inserted (0 when the checklist is missing or not
+        permitted), or None on a database error.
+        """
+        try:
+            with self._connect() as conn:
+                return conn.execute(_SQL_ADD_CHECKLIST_ITEM_IF_PERMITTED,
+                                    (text, telegram_id, checklist_id)).rowcount
+        except sqlite3.Error as e:
+            logging.error(f"Error adding checklist item: {e}")
+            return None
+
+    def remove_checklist_item_if_permitted(self, item_id: int, telegram_id: int) -> Optional[int]:
+        """Remove a checklist item if the user created its checklist or it is shared with them.
+        
+        Returns the number of rows deleted (0 when the item is missing or not
+        permitted), or None on a database error.
+        """
+        try:
+            with self._connect() as conn:
+                return conn.execute(_SQL_REMOVE_CHECKLIST_ITEM_IF_PERMITTED, (item_id, telegram_id)).rowcount
+        except sqlite3.Error as e:
+            logging.error(f"Error removing checklist item: {e}")
+            return None
+
     def get_checklist_item(self, item_id: int) -> Optional[Dict[str, Any]]:
         """Get a checklist item by ID along with checklist details."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT ci.*, ci.checklist_id, c.created_by, c.shared_with
-                    FROM checklist_items ci
-                    JOIN checklists c ON ci.checklist_id = c.id
-                    WHERE ci.id = ?
-                """, (item_id,))
-                row = cursor.fetchone()
+            with self._connect() as conn:
+                row = conn.execute(_SQL_CHECKLIST_ITEM, (item_id,)).fetchone()
                 return dict(row) if row else None
         except sqlite3.Error as e:
             logging.error(f"Error getting checklist item: {e}")
@@ -542,10 +1110,8 @@ class DatabaseManager:
     def remove_checklist_item(self, item_id: int) -> bool:
         """Remove an item from a checklist."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM checklist_items WHERE id = ?", (item_id,))
-                conn.commit()
+            with self._connect() as conn:
+                conn.execute(_SQL_DELETE_CHECKLIST_ITEM, (item_id,))
                 return True
         except sqlite3.Error as e:
             logging.error(f"Error removing checklist item: {e}")
@@ -0,0 +1,9 @@
+"""Helpers for building Telegram Markdown messages."""
+
+# Characters that Telegram's (legacy) Markdown parse mode treats as markup
+_MD_ESCAPE = str.maketrans({c: "\\" + c for c in "_*`["})
+
+
+def escape_md(text) -> str:
+    """Escape user-supplied text for a ParseMode.MARKDOWN message in one pass."""
+    return str(text).translate(_MD_ESCAPE) if text else ""
@@ -1,75 +1,53 @@
+import asyncio
+import hashlib
 import json
 import logging
 import os
-from typing import Dict, Any, Optional
+from functools import partial
+from typing import Dict, Any, Awaitable, Callable, Hashable, List, Optional, Tuple
 from datetime import datetime
 import re
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
+from cache import SemanticCache, TTLCache
 
-class LLMClient:
-    """Handles Google Gemini API interactions for natural language processing."""
-    
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-flash-latest')
-        self.safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
-    
-    async def determine_intent(self, text: str) -> Dict[str, Any]:
-        """Determine the user's intent from natural language text."""
-        try:
-            prompt = f"""
-Analyze the following text and determine if the user wants to:
+# orjson parses the model's JSON replies several times faster; it is optional
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+
+# Static prompt instructions. The per-request text is appended after them, so every
+# request shares a byte-identical prefix that Gemini's implicit context caching can reuse.
+_INTENT_PROMPT = """
+Analyze the user's text and determine if the user wants to:
 1. Create an appointment/meeting/event
 2. Create a checklist/todo list
 3. Something else
 
-Text: "{text}"
-
 Respond with JSON in this format:
-{{
+{
     "type": "appointment" | "checklist" | "unknown",
     "confidence": 0.0-1.0,
     "reason": "brief explanation"
-}}
+}
 
 Examples:
 - "Dinner tomorrow at 7pm" -> appointment
-- "Buy milk, bread, eggs" -> checklist  
+- "Buy milk, bread, eggs" -> checklist
 - "Meeting with John on Friday" -> appointment
 - "Grocery list: apples, bananas" -> checklist
-"""
-            
-            response = await self.model.generate_content_async(
-                prompt,
-                generation_config={"response_mime_type": "application/json", "temperature": 0.1},
-                safety_settings=self.safety_settings
-            )
-            
-            result = json.loads(response.text)
-            return result
-            
-        except Exception as e:
-            logging.error(f"Error determining intent: {e}")
-            return {"type": "unknown", "confidence": 0.0, "reason": "Error processing"}
-    
-    async def extract_appointment_details(self, text: str) -> Dict[str, Any]:
-        """Extract appointment details from natural language text."""
-        try:
-            current_date = datetime.now().strftime("%Y-%m-%d %H:%M")
-            
-            prompt = f"""
-Extract appointment details from the following text. Current date/time: {current_date}
+""".strip()
 
-Text: "{text}"
+_APPOINTMENT_PROMPT = """
+Extract appointment details from the user's text, relative to the current date/time given after it.
 
 Extract and return JSON with these fields:
-{{
+{
     "title": "brief title for the appointment",
     "description": "detailed description (optional)",
     "date": "YYYY-MM-DD",
@@ -78,7 +56,7 @@ Extract and return JSON with these fields:
     "duration_minutes": estimated duration in minutes,
     "success": true/false,
     "error": "error message if parsing failed"
-}}
+}
 
 Rules:
 - If no specific date is mentioned, assume today
@@ -91,7 +69,7 @@ Rules:
 
 Examples:
 "Dinner at Mario's restaurant tomorrow at 7pm" ->
-{{
+{
     "title": "Dinner at Mario's",
     "description": "Dinner at Mario's restaurant",
     "date": "2024-01-16",
@@ -100,55 +78,20 @@ Examples:
     "duration_minutes": 120,
     "success": true,
     "error": null
-}}
-"""
-            
-            response = await self.model.generate_content_async(
-                prompt,
-                generation_config={"response_mime_type": "application/json", "temperature": 0.1},
-                safety_settings=self.safety_settings
-            )
-            
-            result = json.loads(response.text)
-            
-            # Validate and format the result
-            if result.get('success'):
-                # Combine date and time into datetime string
-                date_str = result.get('date', '')
-                time_str = result.get('time', '12:00')
-                
-                try:
-                    appointment_datetime = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
-                    result['appointment_datetime'] = appointment_datetime.isoformat()
-                except ValueError as e:
-                    result['success'] = False
-                    result['error'] = f"Invalid date/time format: {e}"
-            
-            return result
-            
-        except Exception as e:
-            logging.error(f"Error extracting appointment details: {e}")
-            return {
-                "success": False,
-                "error": f"Failed to process appointment: {str(e)}"
-            }
-    
-    async def extract_checklist_details(self, text: str) -> Dict[str, Any]:
-        """Extract checklist details from natural language text."""
-        try:
-            prompt = f"""
-Extract checklist information from the following text:
+}
+""".strip()
 
-Text: "{text}"
+_CHECKLIST_PROMPT = """
+Extract checklist information from the user's text.
 
 Return JSON with these fields:
-{{
+{
     "title": "checklist title",
     "description": "optional description",
     "items": ["item1", "item2", "item3"],
     "success": true/false,
     "error": "error message if parsing failed"
-}}
+}
 
 Rules:
 - Extract a clear, concise title for the checklist
@@ -160,23 +103,223 @@ Rules:
 
 Examples:
 "Grocery Shopping\\nMilk\\nBread\\nEggs\\nApples" ->
-{{
+{
     "title": "Grocery Shopping",
     "description": null,
     "items": ["Milk", "Bread", "Eggs", "Apples"],
     "success": true,
     "error": null
-}}
+}
 
 "Buy milk, bread, and eggs for tomorrow" ->
-{{
+{
     "title": "Shopping List",
     "description": "Items needed for tomorrow",
     "items": ["Milk", "Bread", "Eggs"],
     "success": true,
     "error": null
+}
+""".strip()
+
+_CLASSIFY_PROMPT = f"""
+Decide whether the user's text asks to create an appointment/meeting/event, a checklist/todo list,
+or something else, and extract the details for that kind in the same answer.
+
+Respond with JSON in this format:
+{{
+    "type": "appointment" | "checklist" | "unknown",
+    "details": object with the fields below for the chosen type, or null for "unknown"
 }}
-"""
+
+Appointment details:
+{_APPOINTMENT_PROMPT}
+
+Checklist details:
+{_CHECKLIST_PROMPT}
+""".strip()
+
+
+def normalize_prompt(text: str) -> str:
+    """Normalize user text for cache lookups: lowercase, no punctuation, single spaces."""
+    return ' '.join(_PUNCTUATION_RE.sub('', text.lower()).split())
+
+
+def _finish_appointment_details(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate extracted appointment fields and add the combined datetime."""
+    if result.get('success'):
+        # Combine date and time into datetime string
+        date_str = result.get('date', '')
+        time_str = result.get('time', '12:00')
+        
+        try:
+            appointment_datetime = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+            result['appointment_datetime'] = appointment_datetime.isoformat()
+            # Local-time epoch seconds, so callers can compare without re-parsing
+            result['appointment_epoch'] = appointment_datetime.timestamp()
+        except ValueError as e:
+            result['success'] = False
+            result['error'] = f"Invalid date/time format: {e}"
+    return result
+
+
+def _finish_checklist_details(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate extracted checklist fields and clean up the items."""
+    if result.get('success'):
+        items = result.get('items', [])
+        if not items or len(items) == 0:
+            result['success'] = False
+            result['error'] = "No checklist items found"
+        else:
+            # Clean up items
+            cleaned_items = []
+            for item in items:
+                cleaned_item = item.strip().rstrip('.,;:')
+                if cleaned_item:
+                    cleaned_items.append(cleaned_item)
+            result['items'] = cleaned_items
+    return result
+
+
+class LLMClient:
+    """Handles Google Gemini API interactions for natural language processing."""
+    
+    # Intent results are reused for repeated phrasings of the same message
+    INTENT_CACHE_SIZE = 10000
+    INTENT_CACHE_TTL = 24 * 60 * 60
+    
+    # Successful extractions are reused when the exact same text is sent again
+    EXTRACTION_CACHE_SIZE = 1024
+    EXTRACTION_CACHE_TTL = 60 * 60
+    
+    # Optional paraphrase cache for intents, matched by embedding similarity
+    EMBEDDING_MODEL = 'models/text-embedding-004'
+    SEMANTIC_CACHE_SIZE = 500
+    SEMANTIC_CACHE_THRESHOLD = 0.92
+    
+    def __init__(self, api_key: str, semantic_cache: bool = False):
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel('gemini-flash-latest')
+        self.safety_settings = {
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+        }
+        self._intent_cache = TTLCache(self.INTENT_CACHE_SIZE, self.INTENT_CACHE_TTL)
+        self._appointment_cache = TTLCache(self.EXTRACTION_CACHE_SIZE, self.EXTRACTION_CACHE_TTL)
+        self._checklist_cache = TTLCache(self.EXTRACTION_CACHE_SIZE, self.EXTRACTION_CACHE_TTL)
+        self._classify_cache = TTLCache(self.EXTRACTION_CACHE_SIZE, self.EXTRACTION_CACHE_TTL)
+        self._semantic_cache = (
+            SemanticCache(self.SEMANTIC_CACHE_SIZE, self.SEMANTIC_CACHE_THRESHOLD)
+            if semantic_cache else None
+        )
+        # Requests currently waiting on the API, so identical concurrent prompts share one call
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+    
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Return hit/miss counters and sizes of the response caches."""
+        caches = {
+            'intent': self._intent_cache,
+            'appointment': self._appointment_cache,
+            'checklist': self._checklist_cache,
+            'classify': self._classify_cache,
+        }
+        if self._semantic_cache is not None:
+            caches['semantic_intent'] = self._semantic_cache
+        return {
+            name: {'hits': cache.hits, 'misses': cache.misses, 'size': len(cache)}
+            for name, cache in caches.items()
+        }
+    
+    async def warmup(self):
+        """Open the async API channel before the first user request needs it."""
+        try:
+            await self.model.count_tokens_async("ping")
+        except Exception as e:
+            logging.warning(f"LLM warmup failed: {e}")
+    
+    async def _single_flight(self, key: Hashable,
+                             request: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run request once per key at a time; concurrent callers await the same result."""
+        future = self._inflight.get(key)
+        if future is not None:
+            return dict(await asyncio.shield(future))
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await request()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case no other caller was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+    
+    async def determine_intent(self, text: str) -> Dict[str, Any]:
+        """Determine the user's intent from natural language text."""
+        cache_key = normalize_prompt(text)
+        cached, embedding = await self._cached_intent(text, cache_key)
+        if cached is not None:
+            return cached
+        
+        return await self._single_flight(
+            ('intent', cache_key),
+            partial(self._request_intent, text, cache_key, embedding)
+        )
+    
+    async def _cached_intent(self, text: str,
+                             cache_key: str) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """Look text up in the intent and semantic caches.
+        
+        Returns the cached intent (or None) and the embedding computed for the semantic
+        lookup, so a miss can store its answer without embedding the text again.
+        """
+        cached = self._intent_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached), None
+        
+        embedding = None
+        if self._semantic_cache is not None:
+            embedding = await self._embed(text)
+            if embedding is not None:
+                similar = await asyncio.to_thread(self._semantic_cache.get, embedding)
+                if similar is not None:
+                    self._intent_cache.set(cache_key, similar)
+                    return dict(similar), embedding
+        
+        return None, embedding
+    
+    def _remember_intent(self, cache_key: str, intent: Dict[str, Any],
+                         embedding: Optional[List[float]] = None) -> None:
+        """Store a successful intent answer in the intent and semantic caches."""
+        self._intent_cache.set(cache_key, dict(intent))
+        if embedding is not None:
+            self._semantic_cache.add(embedding, dict(intent))
+    
+    async def _embed(self, text: str) -> Optional[List[float]]:
+        """Embed text for the semantic cache, or return None if the call fails."""
+        try:
+            result = await genai.embed_content_async(
+                model=self.EMBEDDING_MODEL, content=text, task_type='semantic_similarity'
+            )
+            return result['embedding']
+        except Exception as e:
+            logging.warning(f"Error embedding text for the semantic cache: {e}")
+            return None
+    
+    async def _request_intent(self, text: str, cache_key: str,
+                              embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Ask the model for the intent of text and cache a successful answer."""
+        try:
+            prompt = f'{_INTENT_PROMPT}\n\nText: "{text}"'
             
             response = await self.model.generate_content_async(
                 prompt,
@@ -184,23 +327,147 @@ Examples:
                 safety_settings=self.safety_settings
             )
             
-            result = json.loads(response.text)
+            result = _json_loads(response.text)
+            self._remember_intent(cache_key, result, embedding)
+            return result
             
-            # Validate result
+        except Exception as e:
+            logging.error(f"Error determining intent: {e}")
+            return {"type": "unknown", "confidence": 0.0, "reason": "Error processing"}
+    
+    async def extract_appointment_details(self, text: str) -> Dict[str, Any]:
+        """Extract appointment details from natural language text."""
+        # Relative dates resolve against the current minute, so it is part of the key
+        current_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+        cache_key = (text.strip(), current_date)
+        cached = self._appointment_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        return await self._single_flight(
+            ('appointment', cache_key),
+            partial(self._request_appointment_details, text, current_date, cache_key)
+        )
+    
+    async def _request_appointment_details(self, text: str, current_date: str,
+                                           cache_key: Tuple[str, str]) -> Dict[str, Any]:
+        """Ask the model for the appointment details in text and cache a successful answer."""
+        try:
+            prompt = f'{_APPOINTMENT_PROMPT}\n\nCurrent date/time: {current_date}\nText: "{text}"'
+            
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config={"response_mime_type": "application/json", "temperature": 0.1},
+                safety_settings=self.safety_settings
+            )
+            
+            result = _finish_appointment_details(_json_loads(response.text))
             if result.get('success'):
-                items = result.get('items', [])
-                if not items or len(items) == 0:
-                    result['success'] = False
-                    result['error'] = "No checklist items found"
-                else:
-                    # Clean up items
-                    cleaned_items = []
-                    for item in items:
-                        cleaned_item = item.strip().rstrip('.,;:')
-                        if cleaned_item:
-                            cleaned_items.append(cleaned_item)
-                    result['items'] = cleaned_items
+                self._appointment_cache.set(cache_key, dict(result))
+            return result
             
+        except Exception as e:
+            logging.error(f"Error extracting appointment details: {e}")
+            return {
+                "success": False,
+                "error": f"Failed to process appointment: {str(e)}"
+            }
+    
+    async def classify_and_extract(self, text: str) -> Dict[str, Any]:
+        """Determine the intent of text and extract its details with a single model call.
+        
+        Returns {"type": "appointment" | "checklist" | "unknown", "details": dict or None}, where
+        details has the same shape as extract_appointment_details/extract_checklist_details.
+        Text whose intent is already cached (exactly or semantically) only needs the
+        extraction call for that intent; the combined prompt runs on an intent miss.
+        """
+        # Relative dates resolve against the current minute, so it is part of the key
+        current_date = datetime.now().strftime("%Y-%m-%d %H:%M")
+        cache_key = (text.strip(), current_date)
+        cached = self._classify_cache.get(cache_key)
+        if cached is not None:
+            return {'type': cached['type'], 'details': dict(cached['details'])}
+        
+        intent_key = normalize_prompt(text)
+        intent, embedding = await self._cached_intent(text, intent_key)
+        if intent is not None:
+            if intent.get('type') == 'appointment':
+                return {'type': 'appointment', 'details': await self.extract_appointment_details(text)}
+            if intent.get('type') == 'checklist':
+                return {'type': 'checklist', 'details': await self.extract_checklist_details(text)}
+            return {'type': 'unknown', 'details': None}
+        
+        return await self._single_flight(
+            ('classify', cache_key),
+            partial(self._request_classification, text, current_date, cache_key, intent_key, embedding)
+        )
+    
+    async def _request_classification(self, text: str, current_date: str,
+                                      cache_key: Tuple[str, str], intent_key: str,
+                                      embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Ask the model for the intent and details of text and cache a successful answer."""
+        try:
+            prompt = f'{_CLASSIFY_PROMPT}\n\nCurrent date/time: {current_date}\nText: "{text}"'
+            
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config={"response_mime_type": "application/json", "temperature": 0.1},
+                safety_settings=self.safety_settings
+            )
+            
+            result = _json_loads(response.text)
+            intent_type = result.get('type')
+            if intent_type not in ('appointment', 'checklist'):
+                intent_type = 'unknown'
+            self._remember_intent(
+                intent_key,
+                {"type": intent_type, "confidence": 1.0, "reason": "Classified with details"},
+                embedding
+            )
+            
+            details = result.get('details') or {}
+            if intent_type == 'appointment':
+                details = _finish_appointment_details(details)
+            elif intent_type == 'checklist':
+                details = _finish_checklist_details(details)
+            else:
+                return {'type': 'unknown', 'details': None}
+            
+            if details.get('success'):
+                self._classify_cache.set(cache_key, {'type': intent_type, 'details': dict(details)})
+            return {'type': intent_type, 'details': details}
+            
+        except Exception as e:
+            logging.error(f"Error classifying and extracting details: {e}")
+            return {'type': 'unknown', 'details': None}
+    
+    async def extract_checklist_details(self, text: str) -> Dict[str, Any]:
+        """Extract checklist details from natural language text."""
+        # Checklist texts can be long lists, so the cache holds a digest rather than the text
+        cache_key = hashlib.sha256(text.strip().encode()).digest()
+        cached = self._checklist_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
+        return await self._single_flight(
+            ('checklist', cache_key),
+            partial(self._request_checklist_details, text, cache_key)
+        )
+    
+    async def _request_checklist_details(self, text: str, cache_key: bytes) -> Dict[str, Any]:
+        """Ask the model for the checklist details in text and cache a successful answer."""
+        try:
+            prompt = f'{_CHECKLIST_PROMPT}\n\nText: "{text}"'
+            
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config={"response_mime_type": "application/json", "temperature": 0.1},
+                safety_settings=self.safety_settings
+            )
+            
+            result = _finish_checklist_details(_json_loads(response.text))
+            if result.get('success'):
+                self._checklist_cache.set(cache_key, dict(result))
             return result
             
         except Exception as e:
@@ -241,7 +508,7 @@ Handle expressions like:
                 safety_settings=self.safety_settings
             )
             
-            result = json.loads(response.text)
+            result = _json_loads(response.text)
             
             if result.get('success') and result.get('datetime'):
                 return datetime.strptime(result['datetime'], "%Y-%m-%d %H:%M")
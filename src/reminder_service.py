@@ -6,6 +6,7 @@ from threading import Thread
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 from database import DatabaseManager
+from formatting import escape_md
 from telegram import Bot
 from telegram.constants import ParseMode
 
@@ -98,9 +99,9 @@ class ReminderService:
     
     def _format_reminder_message(self, appointment: Dict[str, Any], time_until: timedelta) -> str:
         """Format the reminder message."""
-        title = appointment.get('title', 'Appointment')
-        location = appointment.get('location', '')
-        description = appointment.get('description', '')
+        title = escape_md(appointment.get('title', 'Appointment'))
+        location = escape_md(appointment.get('location', ''))
+        description = escape_md(appointment.get('description', ''))
         appointment_date = appointment.get('appointment_date', '')
         
         # Format time until appointment
@@ -120,7 +121,7 @@ class ReminderService:
         
         # Parse and format the appointment date
         try:
-            dt = datetime.fromisoformat(appointment_date.replace(' ', 'T'))
+            dt = datetime.fromisoformat(appointment_date)
             formatted_date = dt.strftime('%A, %B %d at %I:%M %p')
             message += f"📆 {formatted_date}\n"
         except:
@@ -158,7 +159,7 @@ class ReminderService:
                                                   update_type: str, user_telegram_id: int):
         """Send notification when an appointment is updated."""
         try:
-            title = appointment.get('title', 'Appointment')
+            title = escape_md(appointment.get('title', 'Appointment'))
             
             if update_type == 'created':
                 message = f"✅ **New Appointment Created**\n\n📅 **{title}**\n"
@@ -173,17 +174,17 @@ class ReminderService:
             if update_type in ['created', 'updated']:
                 if appointment.get('appointment_date'):
                     try:
-                        dt = datetime.fromisoformat(appointment['appointment_date'].replace(' ', 'T'))
+                        dt = datetime.fromisoformat(appointment['appointment_date'])
                         formatted_date = dt.strftime('%A, %B %d at %I:%M %p')
                         message += f"📆 {formatted_date}\n"
                     except:
                         message += f"📆 {appointment['appointment_date']}\n"
                 
                 if appointment.get('location'):
-                    message += f"📍 {appointment['location']}\n"
+                    message += f"📍 {escape_md(appointment['location'])}\n"
                 
                 if appointment.get('description'):
-                    message += f"📝 {appointment['description']}\n"
+                    message += f"📝 {escape_md(appointment['description'])}\n"
             
             # Send to paired user
             user = self.db.get_user_by_telegram_id(user_telegram_id)
@@ -204,7 +205,7 @@ class ReminderService:
                                         notification_type: str, user_telegram_id: int):
         """Send notification for checklist updates."""
         try:
-            title = checklist.get('title', 'Checklist')
+            title = escape_md(checklist.get('title', 'Checklist'))
             
             if notification_type == 'created':
                 message = f"✅ **New Checklist Created**\n\n📋 **{title}**\n"
@@ -216,7 +217,7 @@ class ReminderService:
                 message = f"📋 **Checklist {notification_type}**\n\n**{title}**\n"
             
             if checklist.get('description'):
-                message += f"📝 {checklist['description']}\n"
+                message += f"📝 {escape_md(checklist['description'])}\n"
             
             # Send to paired user
             user = self.db.get_user_by_telegram_id(user_telegram_id)
@@ -246,9 +247,7 @@ class ReminderService:
             
             user_id = user['id']
             
-            import sqlite3
-            with sqlite3.connect(self.db.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.db.connection() as conn:
                 cursor = conn.cursor()
                 
                 # Get today's appointments
@@ -274,30 +273,31 @@ class ReminderService:
                     })
             
             # Format summary message
-            message = f"🌅 **Daily Summary for {today.strftime('%A, %B %d')}**\n\n"
+            parts = [f"🌅 **Daily Summary for {today.strftime('%A, %B %d')}**\n\n"]
             
             if appointments:
-                message += "📅 **Today's Appointments:**\n"
+                parts.append("📅 **Today's Appointments:**\n")
                 for apt in appointments:
                     try:
                         dt = datetime.fromisoformat(apt['appointment_date'])
                         time_str = dt.strftime('%I:%M %p')
-                        message += f"• {apt['title']} at {time_str}\n"
+                        parts.append(f"• {escape_md(apt['title'])} at {time_str}\n")
                     except:
-                        message += f"• {apt['title']}\n"
-                message += "\n"
+                        parts.append(f"• {escape_md(apt['title'])}\n")
+                parts.append("\n")
             else:
-                message += "📅 No appointments scheduled for today\n\n"
+                parts.append("📅 No appointments scheduled for today\n\n")
             
             if incomplete_items:
-                message += "✅ **Pending Checklist Items:**\n"
+                parts.append("✅ **Pending Checklist Items:**\n")
                 for item in incomplete_items:
-                    message += f"• {item['checklist']}: {item['items']} item{'s' if item['items'] != 1 else ''}\n"
-                message += "\n"
+                    parts.append(f"• {escape_md(item['checklist'])}: {item['items']} item{'s' if item['items'] != 1 else ''}\n")
+                parts.append("\n")
             else:
-                message += "✅ All checklist items completed!\n\n"
+                parts.append("✅ All checklist items completed!\n\n")
             
-            message += "Have a great day! 🌟"
+            parts.append("Have a great day! 🌟")
+            message = "".join(parts)
             
             await self.bot.send_message(
                 chat_id=user_telegram_id,
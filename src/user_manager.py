@@ -1,13 +1,28 @@
 import logging
 from typing import Dict, Any, Optional
 from database import DatabaseManager
+from cache import TTLCache
+from formatting import escape_md
 
 
 class UserManager:
     """Manages user registration, authentication, and pairing."""
     
+    # Pairing only changes through pair_users/unpair_user, which invalidate these
+    PAIRED_CACHE_TTL = 300
+    STATUS_CACHE_TTL = 30
+    CACHE_SIZE = 4096
+    
     def __init__(self, db: DatabaseManager):
         self.db = db
+        self._paired_cache = TTLCache(self.CACHE_SIZE, self.PAIRED_CACHE_TTL)
+        self._status_cache = TTLCache(self.CACHE_SIZE, self.STATUS_CACHE_TTL)
+    
+    def _invalidate(self, *telegram_ids: int):
+        """Drop cached pairing state and status for the given users."""
+        for telegram_id in telegram_ids:
+            self._paired_cache.pop(telegram_id)
+            self._status_cache.pop(telegram_id)
     
     def register_user(self, telegram_id: int, username: str = None, 
                      first_name: str = None, last_name: str = None) -> bool:
@@ -15,6 +30,7 @@ class UserManager:
         try:
             success = self.db.add_user(telegram_id, username, first_name, last_name)
             if success:
+                self._invalidate(telegram_id)
                 logging.info(f"User registered: {telegram_id} (@{username})")
             return success
         except Exception as e:
@@ -30,10 +46,18 @@ class UserManager:
         user = self.get_user(telegram_id)
         return user is not None
     
+    def peek_paired(self, telegram_id: int) -> Optional[bool]:
+        """Return the cached pairing state, or None if it is not cached (no database access)."""
+        return self._paired_cache.get(telegram_id)
+    
     def is_user_paired(self, telegram_id: int) -> bool:
         """Check if a user is paired with another user."""
-        user = self.get_user(telegram_id)
-        return user is not None and user.get('paired_user_id') is not None
+        paired = self._paired_cache.get(telegram_id)
+        if paired is None:
+            user = self.get_user(telegram_id)
+            paired = user is not None and user.get('paired_user_id') is not None
+            self._paired_cache.set(telegram_id, paired)
+        return paired
     
     def get_paired_user(self, telegram_id: int) -> Optional[Dict[str, Any]]:
         """Get the paired user for a given user."""
@@ -84,6 +108,7 @@ class UserManager:
             success = self.db.pair_users(user1_telegram_id, user2['telegram_id'])
             
             if success:
+                self._invalidate(user1_telegram_id, user2['telegram_id'])
                 logging.info(f"Users paired: {user1_telegram_id} with {user2['telegram_id']}")
                 return {
                     'success': True,
@@ -105,9 +130,7 @@ class UserManager:
     def _find_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
         """Find a user by their username."""
         try:
-            import sqlite3
-            with sqlite3.connect(self.db.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.db.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
                 row = cursor.fetchone()
@@ -118,17 +141,25 @@ class UserManager:
     
     def get_user_status(self, telegram_id: int) -> str:
         """Get user's current status."""
+        status = self._status_cache.get(telegram_id)
+        if status is None:
+            status = self._build_user_status(telegram_id)
+            self._status_cache.set(telegram_id, status)
+        return status
+    
+    def _build_user_status(self, telegram_id: int) -> str:
+        """Build the status text shown by /status."""
         user = self.get_user(telegram_id)
         if not user:
             return "❌ You are not registered. Use /start to register."
         
         status = f"👤 *User Status*\n\n"
-        status += f"Name: {user.get('first_name', 'N/A')} {user.get('last_name', '')}\n"
-        status += f"Username: @{user.get('username', 'N/A')}\n"
+        status += f"Name: {escape_md(user.get('first_name', 'N/A'))} {escape_md(user.get('last_name', ''))}\n"
+        status += f"Username: @{escape_md(user.get('username', 'N/A'))}\n"
         
         if self.is_user_paired(telegram_id):
             paired_user = self.get_paired_user(telegram_id)
-            status += f"✅ Paired with: {paired_user.get('first_name', 'N/A')} (@{paired_user.get('username', 'N/A')})\n"
+            status += f"✅ Paired with: {escape_md(paired_user.get('first_name', 'N/A'))} (@{escape_md(paired_user.get('username', 'N/A'))})\n"
         else:
             status += "❌ Not paired. Use `/pair @username` to pair with your partner.\n"
         
@@ -137,8 +168,7 @@ class UserManager:
     def unpair_user(self, telegram_id: int) -> bool:
         """Unpair a user from their partner."""
         try:
-            import sqlite3
-            with sqlite3.connect(self.db.db_path) as conn:
+            with self.db.connection() as conn:
                 cursor = conn.cursor()
                 
                 # Get current user and their paired user
@@ -148,12 +178,16 @@ class UserManager:
                 
                 user_id = user['id']
                 paired_user_id = user['paired_user_id']
+                paired_user = self.get_paired_user(telegram_id)
                 
                 # Unpair both users
                 cursor.execute("UPDATE users SET paired_user_id = NULL WHERE id = ?", (user_id,))
                 cursor.execute("UPDATE users SET paired_user_id = NULL WHERE id = ?", (paired_user_id,))
                 
                 conn.commit()
+                self._invalidate(telegram_id)
+                if paired_user:
+                    self._invalidate(paired_user['telegram_id'])
                 logging.info(f"Users unpaired: {user_id} and {paired_user_id}")
                 return True
                 
@@ -164,13 +198,11 @@ class UserManager:
     def get_all_users(self) -> list:
         """Get all registered users (for admin purposes)."""
         try:
-            import sqlite3
-            with sqlite3.connect(self.db.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.db.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT * FROM users ORDER BY created_at DESC")
                 rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+                return list(map(dict, rows))
         except Exception as e:
             logging.error(f"Error getting all users: {e}")
             return []
@@ -178,8 +210,7 @@ class UserManager:
     def get_user_count(self) -> int:
         """Get total number of registered users."""
         try:
-            import sqlite3
-            with sqlite3.connect(self.db.db_path) as conn:
+            with self.db.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT COUNT(*) FROM users")
                 return cursor.fetchone()[0]
@@ -190,8 +221,7 @@ class UserManager:
     def get_paired_users_count(self) -> int:
         """Get number of paired users."""
         try:
-            import sqlite3
-            with sqlite3.connect(self.db.db_path) as conn:
+            with self.db.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT COUNT(*) FROM users WHERE paired_user_id IS NOT NULL")
                 return cursor.fetchone()[0]
@@ -31,7 +31,9 @@ def temp_db():
 @pytest.fixture
 def db_manager(temp_db):
     """Create a DatabaseManager instance with a temporary database."""
-    return DatabaseManager(temp_db)
+    manager = DatabaseManager(temp_db)
+    yield manager
+    manager.close()
 
 
 @pytest.fixture
@@ -2,7 +2,7 @@
 Unit tests for appointment creation functionality.
 """
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest.mock import AsyncMock
 
 
@@ -121,6 +121,32 @@ class TestCreateAppointmentFromText:
         # Assert
         assert result['success'] is False
         assert 'error' in result['message'].lower()
+    
+    @pytest.mark.asyncio
+    async def test_appointment_creation_with_string_duration(self, appointment_manager, test_user, mock_llm_client):
+        """Test that a numeric string duration is coerced and an unparseable one is rejected."""
+        # Arrange
+        details = {
+            'success': True,
+            'title': 'Movie',
+            'description': '',
+            'appointment_datetime': (datetime.now() + timedelta(days=1)).isoformat(),
+            'location': '',
+        }
+        
+        # Act
+        numeric = await appointment_manager.create_appointment_from_details(
+            {**details, 'duration_minutes': '90'}, test_user
+        )
+        unparseable = await appointment_manager.create_appointment_from_details(
+            {**details, 'duration_minutes': '1.5h'}, test_user
+        )
+        
+        # Assert
+        assert numeric['success'] is True
+        assert numeric['appointment']['duration_minutes'] == 90
+        assert unparseable['success'] is False
+        assert 'error' in unparseable['message'].lower()
 
 
 class TestCreateAppointmentManual:
@@ -448,3 +474,22 @@ class TestAppointmentEdgeCases:
         # Verify both exist
         appointments = await appointment_manager.get_user_appointments(test_user)
         assert len(appointments) == 2
+    
+    def test_relative_time_descriptions(self, appointment_manager):
+        """Test relative time buckets across hour and day boundaries."""
+        now = datetime(2026, 3, 1, 12, 0)
+        
+        cases = [
+            (timedelta(minutes=-5), "Started"),
+            (timedelta(minutes=30), "In 30 minutes"),
+            (timedelta(hours=1, minutes=30), "In 1 hours"),
+            (timedelta(hours=23, minutes=59), "In 23 hours"),
+            (timedelta(days=1, hours=3), "Tomorrow"),
+            (timedelta(days=3), "In 3 days"),
+            (timedelta(days=14), "In 2 weeks"),
+            (timedelta(days=65), "In 2 months"),
+        ]
+        
+        for offset, expected in cases:
+            assert appointment_manager._get_relative_time(now + offset, now) == expected
+
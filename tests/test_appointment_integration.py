@@ -113,6 +113,57 @@ class TestAppointmentCreationIntegration:
         assert appointments[1]['title'] == "Meeting 2"
         assert appointments[2]['title'] == "Meeting 3"
     
+    @pytest.mark.asyncio
+    async def test_upcoming_filter_and_limit(self, appointment_manager, db_manager, test_user):
+        """Test that past appointments are filtered in SQL and the limit is applied."""
+        # Arrange - One past (stored directly, manual creation rejects it) and two upcoming
+        now = datetime.now()
+        db_manager.create_appointment("Past", "Test", now - timedelta(hours=2), "Office", test_user)
+        for title, date in [("Next", now + timedelta(hours=2)),
+                            ("Later", now + timedelta(days=2))]:
+            await appointment_manager.create_appointment_manual(
+                title=title,
+                description="Test",
+                appointment_date=date,
+                location="Office",
+                user_telegram_id=test_user
+            )
+        
+        # Act
+        upcoming = await appointment_manager.get_user_appointments(test_user)
+        first_upcoming = await appointment_manager.get_user_appointments(test_user, limit=1)
+        everything = await appointment_manager.get_user_appointments(test_user, upcoming_only=False)
+        
+        # Assert
+        assert [a['title'] for a in upcoming] == ["Next", "Later"]
+        assert [a['title'] for a in first_upcoming] == ["Next"]
+        assert [a['title'] for a in everything] == ["Past", "Next", "Later"]
+    
+    @pytest.mark.asyncio
+    async def test_export_includes_past_and_upcoming(self, appointment_manager, db_manager, test_user):
+        """Test that the text export lists every appointment in chronological order."""
+        # Arrange
+        now = datetime.now()
+        db_manager.create_appointment("Old Dinner", "", now - timedelta(days=3), "Bistro", test_user)
+        await appointment_manager.create_appointment_manual(
+            title="Next Lunch",
+            description="With the team",
+            appointment_date=now + timedelta(days=1),
+            location="",
+            user_telegram_id=test_user
+        )
+        
+        # Act
+        export = await appointment_manager.export_appointments(test_user)
+        
+        # Assert
+        assert export.index("**Old Dinner**") < export.index("**Next Lunch**")
+        assert "Location: Bistro" in export
+        assert "Description: With the team" in export
+        
+        # The connection is released once the export completes
+        assert len(await appointment_manager.get_user_appointments(test_user)) == 1
+    
     @pytest.mark.asyncio
     async def test_appointment_update_workflow(self, appointment_manager, test_user):
         """Test updating an appointment after creation."""
@@ -147,6 +198,63 @@ class TestAppointmentCreationIntegration:
         assert updated['description'] == "Updated description"
         assert updated['location'] == "Original Location"  # Unchanged
     
+    @pytest.mark.asyncio
+    async def test_appointment_update_without_changes(self, appointment_manager, test_user):
+        """Test that re-submitting the current values succeeds without altering the appointment."""
+        # Arrange - Create appointment
+        future_date = datetime.now() + timedelta(days=1)
+        result = await appointment_manager.create_appointment_manual(
+            title="Same Title",
+            description="Same description",
+            appointment_date=future_date,
+            location="Office",
+            user_telegram_id=test_user
+        )
+        
+        appointment_id = result['appointment']['id']
+        
+        # Act - Update with identical values
+        update_result = await appointment_manager.update_appointment(
+            appointment_id=appointment_id,
+            user_telegram_id=test_user,
+            title="Same Title",
+            location="Office"
+        )
+        
+        # Assert
+        assert update_result['success'] is True
+        unchanged = await appointment_manager.get_appointment_by_id(appointment_id)
+        assert unchanged['title'] == "Same Title"
+        assert unchanged['location'] == "Office"
+    
+    @pytest.mark.asyncio
+    async def test_appointment_update_can_clear_optional_field(self, appointment_manager, test_user):
+        """Test that passing None for an optional field clears it."""
+        # Arrange - Create appointment
+        future_date = datetime.now() + timedelta(days=1)
+        result = await appointment_manager.create_appointment_manual(
+            title="Walk",
+            description="Evening walk",
+            appointment_date=future_date,
+            location="Park",
+            user_telegram_id=test_user
+        )
+        
+        appointment_id = result['appointment']['id']
+        
+        # Act
+        update_result = await appointment_manager.update_appointment(
+            appointment_id=appointment_id,
+            user_telegram_id=test_user,
+            location=None
+        )
+        
+        # Assert
+        assert update_result['success'] is True
+        updated = await appointment_manager.get_appointment_by_id(appointment_id)
+        assert updated['location'] is None
+        assert updated['title'] == "Walk"
+    
     @pytest.mark.asyncio
     async def test_appointment_deletion_workflow(self, appointment_manager, test_user):
         """Test deleting an appointment."""
@@ -186,7 +294,6 @@ class TestAppointmentCreationIntegration:
         assert len(appointments_after) == 0
     
     @pytest.mark.asyncio
-    @pytest.mark.xfail(reason="Conflict detection SQL query has datetime comparison issues")
     async def test_conflicting_appointments_detection(self, appointment_manager, test_user):
         """Test detection of conflicting appointments."""
         # Arrange - Create first appointment
@@ -214,7 +321,88 @@ class TestAppointmentCreationIntegration:
         assert conflicts[0]['title'] == "First Meeting"
     
     @pytest.mark.asyncio
-    @pytest.mark.xfail(reason="Date-specific query has datetime comparison issues with ISO format")
+    async def test_non_overlapping_appointment_is_not_a_conflict(self, appointment_manager, test_user):
+        """Test that appointments outside the requested window are not reported."""
+        # Arrange - Create a 14:00 appointment
+        base_date = datetime.now() + timedelta(days=1)
+        base_date = base_date.replace(hour=14, minute=0, second=0, microsecond=0)
+        
+        await appointment_manager.create_appointment_manual(
+            title="First Meeting",
+            description="1 hour meeting",
+            appointment_date=base_date,
+            location="Room A",
+            user_telegram_id=test_user
+        )
+        
+        # Act - Check 15:00-16:00, which starts when the first meeting ends
+        conflicts = await appointment_manager.get_conflicting_appointments(
+            user_telegram_id=test_user,
+            appointment_date=base_date + timedelta(hours=1),
+            duration_minutes=60
+        )
+        
+        # Assert - No conflict
+        assert conflicts == []
+    
+    @pytest.mark.asyncio
+    async def test_conflict_uses_stored_duration(self, appointment_manager, test_user, mock_llm_client):
+        """Test that conflict detection honours the duration stored with an appointment."""
+        # Arrange - Create a 3 hour appointment at 14:00
+        base_date = datetime.now() + timedelta(days=1)
+        base_date = base_date.replace(hour=14, minute=0, second=0, microsecond=0)
+        
+        mock_llm_client.extract_appointment_details = AsyncMock(return_value={
+            'success': True,
+            'title': 'Workshop',
+            'description': 'Long workshop',
+            'appointment_datetime': base_date.isoformat(),
+            'location': 'Room B',
+            'duration_minutes': 180
+        })
+        await appointment_manager.create_appointment_from_text("Workshop tomorrow 2-5pm", test_user)
+        
+        # Act - Check 16:00-17:00, inside the workshop but past a 60 minute default
+        conflicts = await appointment_manager.get_conflicting_appointments(
+            user_telegram_id=test_user,
+            appointment_date=base_date + timedelta(hours=2),
+            duration_minutes=60
+        )
+        
+        # Assert
+        assert len(conflicts) == 1
+        assert conflicts[0]['title'] == "Workshop"
+    
+    @pytest.mark.asyncio
+    async def test_conflict_follows_rescheduled_appointment(self, appointment_manager, test_user):
+        """Test that conflict detection uses the new time after an appointment is moved."""
+        # Arrange - Create an appointment at 10:00, then move it to 15:00
+        base_date = datetime.now() + timedelta(days=1)
+        base_date = base_date.replace(hour=10, minute=0, second=0, microsecond=0)
+        result = await appointment_manager.create_appointment_manual(
+            title="Moved Meeting",
+            description="Rescheduled",
+            appointment_date=base_date,
+            location="Office",
+            user_telegram_id=test_user
+        )
+        await appointment_manager.update_appointment(
+            appointment_id=result['appointment']['id'],
+            user_telegram_id=test_user,
+            appointment_date=base_date.replace(hour=15)
+        )
+        
+        # Act
+        old_slot = await appointment_manager.get_conflicting_appointments(test_user, base_date)
+        new_slot = await appointment_manager.get_conflicting_appointments(
+            test_user, base_date.replace(hour=15, minute=30)
+        )
+        
+        # Assert
+        assert old_slot == []
+        assert len(new_slot) == 1
+    
+    @pytest.mark.asyncio
     async def test_appointments_for_specific_date(self, appointment_manager, test_user):
         """Test retrieving appointments for a specific date."""
         # Arrange - Create appointments on different days
@@ -352,3 +540,16 @@ class TestAppointmentPermissions:
         # Verify the update
         updated = await appointment_manager.get_appointment_by_id(appointment_id)
         assert updated['description'] == "Updated by user 2"
+    
+    @pytest.mark.asyncio
+    async def test_delete_nonexistent_appointment(self, appointment_manager, test_user):
+        """Test that deleting a missing appointment reports it as not found."""
+        # Act
+        delete_result = await appointment_manager.delete_appointment(
+            appointment_id=999999,
+            user_telegram_id=test_user
+        )
+        
+        # Assert
+        assert delete_result['success'] is False
+        assert 'not found' in delete_result['message'].lower()
@@ -0,0 +1,38 @@
+"""
+Unit tests for bot command handlers.
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from bot import CupidGPTBot
+from llm_client import LLMClient
+
+
+class TestStatusCommand:
+    """Test suite for the /status command."""
+    
+    @pytest.mark.asyncio
+    async def test_debug_status_escapes_cache_names(self):
+        """Test that cache names with underscores do not break the Markdown reply."""
+        # Arrange
+        async def run_db(fn, *args):
+            return fn(*args)
+        
+        bot = SimpleNamespace(
+            cfg=SimpleNamespace(debug_mode=True),
+            openai_client=LLMClient(api_key="test_api_key", semantic_cache=True),
+            user_manager=MagicMock(get_user_status=MagicMock(return_value="✅ You are paired")),
+            _db=run_db,
+        )
+        update = MagicMock()
+        update.effective_user.id = 123456789
+        update.effective_message.reply_text = AsyncMock()
+        
+        # Act
+        await CupidGPTBot.status_command(bot, update, MagicMock())
+        
+        # Assert
+        status = update.effective_message.reply_text.await_args.args[0]
+        assert "semantic\\_intent 0/0 hits" in status
+        assert "semantic_intent" not in status
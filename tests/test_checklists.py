@@ -0,0 +1,298 @@
+"""
+Tests for checklist storage and retrieval.
+"""
+import pytest
+
+from checklist_manager import ChecklistManager
+
+
+@pytest.fixture
+def checklist_manager(db_manager, mock_llm_client):
+    """Create a ChecklistManager instance with mocked dependencies."""
+    return ChecklistManager(db_manager, mock_llm_client)
+
+
+class TestLatestChecklistWithItems:
+    """Tests for fetching the newest checklist and its items in one query."""
+    
+    @pytest.mark.asyncio
+    async def test_returns_newest_checklist_with_items(self, checklist_manager, db_manager, test_paired_users):
+        """Test that the newest checklist is returned with its items in order."""
+        # Arrange
+        user1 = test_paired_users['user1']
+        user2 = test_paired_users['user2']
+        old_id = db_manager.create_checklist("Old", "", user1)
+        db_manager.add_checklist_item(old_id, "Old item")
+        new_id = db_manager.create_checklist("Groceries", "Weekly shop", user1)
+        db_manager.add_checklist_item(new_id, "Milk")
+        db_manager.add_checklist_item(new_id, "Bread")
+        items = db_manager.get_checklist_items(new_id)
+        db_manager.toggle_checklist_item(items[0]['id'], user2)
+        
+        # Act
+        checklist = await checklist_manager.get_latest_checklist_with_items(user2)
+        
+        # Assert
+        assert checklist.id == new_id
+        assert checklist.title == "Groceries"
+        assert checklist.description == "Weekly shop"
+        assert [item.text for item in checklist.items] == ["Milk", "Bread"]
+        assert checklist.items[0].completed
+        assert checklist.items[0].completed_by_name == "User"
+        assert not checklist.items[1].completed
+    
+    @pytest.mark.asyncio
+    async def test_checklist_without_items_and_no_checklists(self, checklist_manager, db_manager, test_user):
+        """Test an empty checklist yields no items and a user without checklists yields None."""
+        # Arrange / Act
+        missing = await checklist_manager.get_latest_checklist_with_items(test_user)
+        checklist_id = db_manager.create_checklist("Empty", "", test_user)
+        checklist = await checklist_manager.get_latest_checklist_with_items(test_user)
+        
+        # Assert
+        assert missing is None
+        assert checklist.id == checklist_id
+        assert checklist.items == ()
+    
+    @pytest.mark.asyncio
+    async def test_summary_by_id_uses_joined_checklist(self, checklist_manager, db_manager, test_user):
+        """Test that a checklist summary is built from the single joined fetch."""
+        # Arrange
+        checklist_id = db_manager.create_checklist("Groceries", "Weekly shop", test_user)
+        db_manager.add_checklist_item(checklist_id, "Milk")
+        db_manager.add_checklist_item(checklist_id, "Bread")
+        
+        # Act
+        checklist = await checklist_manager.get_checklist_with_items(checklist_id)
+        summary = await checklist_manager.get_checklist_summary(checklist_id)
+        missing = await checklist_manager.get_checklist_with_items(checklist_id + 1)
+        
+        # Assert
+        assert [item.text for item in checklist.items] == ["Milk", "Bread"]
+        assert "Progress: 0/2 items completed" in summary
+        assert "⬜ Bread" in summary
+        assert missing is None
+    
+    @pytest.mark.asyncio
+    async def test_summary_escapes_markdown_in_user_text(self, checklist_manager, db_manager, test_user):
+        """Test that Markdown characters typed by users are escaped in the summary."""
+        # Arrange
+        checklist_id = db_manager.create_checklist("Mum_s *party*", "", test_user)
+        db_manager.add_checklist_item(checklist_id, "Buy [balloons]")
+        
+        # Act
+        summary = await checklist_manager.get_checklist_summary(checklist_id)
+        
+        # Assert
+        assert "📋 **Mum\\_s \\*party\\***" in summary
+        assert "⬜ Buy \\[balloons]" in summary
+
+
+class TestBulkChecklistItems:
+    """Tests for inserting checklist items in one transaction."""
+    
+    def test_bulk_insert_keeps_order(self, db_manager, test_user):
+        """Test that every item is stored in the given order."""
+        # Arrange
+        checklist_id = db_manager.create_checklist("Packing", "", test_user)
+        
+        # Act
+        added = db_manager.add_checklist_items_bulk(checklist_id, ["Passport", "Charger", "Socks"])
+        
+        # Assert
+        assert added == ["Passport", "Charger", "Socks"]
+        assert [item['text'] for item in db_manager.get_checklist_items(checklist_id)] == added
+    
+    def test_bulk_insert_is_all_or_nothing(self, db_manager, test_user):
+        """Test that a failing row rolls back the whole batch."""
+        # Arrange
+        checklist_id = db_manager.create_checklist("Packing", "", test_user)
+        
+        # Act
+        added = db_manager.add_checklist_items_bulk(checklist_id, ["Passport", None])
+        
+        # Assert
+        assert added == []
+        assert db_manager.get_checklist_items(checklist_id) == []
+
+
+class TestUserChecklists:
+    """Tests for listing a user's checklists with their item counts."""
+    
+    @pytest.mark.asyncio
+    async def test_counts_items_per_checklist(self, checklist_manager, db_manager, test_user):
+        """Test that item totals and completion come from one aggregate query."""
+        # Arrange
+        empty_id = db_manager.create_checklist("Empty", "", test_user)
+        packing_id = db_manager.create_checklist("Packing", "", test_user)
+        db_manager.add_checklist_items_bulk(packing_id, ["Passport", "Charger", "Socks", "Hat"])
+        first_item = db_manager.get_checklist_items(packing_id)[0]
+        db_manager.toggle_checklist_item(first_item['id'], test_user)
+        
+        # Act
+        checklists = await checklist_manager.get_user_checklists(test_user)
+        
+        # Assert
+        stats = {c['id']: (c['total_items'], c['completed_items'], c['completion_percentage']) for c in checklists}
+        assert stats == {empty_id: (0, 0, 0), packing_id: (4, 1, 25.0)}
+    
+    @pytest.mark.asyncio
+    async def test_export_reads_checklist_and_items_together(self, checklist_manager, db_manager, test_user):
+        """Test that exports are rendered from the joined checklist fetch."""
+        # Arrange
+        checklist_id = db_manager.create_checklist("Packing", "Trip", test_user)
+        db_manager.add_checklist_items_bulk(checklist_id, ["Passport", "Socks"])
+        first_item = db_manager.get_checklist_items(checklist_id)[0]
+        db_manager.toggle_checklist_item(first_item['id'], test_user)
+        
+        # Act
+        text = await checklist_manager.export_checklist(checklist_id)
+        markdown = await checklist_manager.export_checklist(checklist_id, 'markdown')
+        
+        # Assert
+        assert text == "📋 Packing\n📝 Trip\n\n1. [x] Passport\n2. [ ] Socks\n"
+        assert markdown == "# Packing\n\nTrip\n\n- [x] Passport\n- [ ] Socks\n"
+
+    
+    @pytest.mark.asyncio
+    async def test_completion_stats_are_aggregated(self, checklist_manager, db_manager, test_user):
+        """Test the overall totals, counting only fully ticked non-empty checklists as completed."""
+        # Arrange
+        db_manager.create_checklist("Empty", "", test_user)
+        done_id = db_manager.create_checklist("Done", "", test_user)
+        db_manager.add_checklist_items_bulk(done_id, ["Passport"])
+        open_id = db_manager.create_checklist("Open", "", test_user)
+        db_manager.add_checklist_items_bulk(open_id, ["Milk", "Bread", "Eggs"])
+        for checklist_id in (done_id, open_id):
+            db_manager.toggle_checklist_item(db_manager.get_checklist_items(checklist_id)[0]['id'], test_user)
+        
+        # Act
+        stats = await checklist_manager.get_completion_stats(test_user)
+        
+        # Assert
+        assert stats == {
+            'total_checklists': 3,
+            'completed_checklists': 1,
+            'total_items': 4,
+            'completed_items': 2,
+            'overall_completion_percentage': 50.0,
+        }
+
+class TestChecklistCache:
+    """Tests for cached checklist reads and their invalidation."""
+    
+    @pytest.mark.asyncio
+    async def test_toggle_invalidates_cached_checklist(self, checklist_manager, db_manager, test_user):
+        """Test that repeat reads are cached and a toggle refreshes them."""
+        # Arrange
+        checklist_id = db_manager.create_checklist("Packing", "", test_user)
+        db_manager.add_checklist_items_bulk(checklist_id, ["Passport", "Socks"])
+        first = await checklist_manager.get_checklist_with_items(checklist_id)
+        
+        # Act
+        cached = await checklist_manager.get_checklist_with_items(checklist_id)
+        toggled = checklist_manager.toggle_item(first.items[0].id, test_user)
+        refreshed = await checklist_manager.get_checklist_with_items(checklist_id)
+        
+        # Assert
+        assert cached is first
+        assert toggled
+        assert refreshed.items[0].completed
+        assert not first.items[0].completed
+    
+    @pytest.mark.asyncio
+    async def test_writes_invalidate_when_item_index_misses(self, checklist_manager, db_manager, test_user):
+        """Test that toggles and removals refresh the checklist after its items left the index."""
+        # Arrange
+        checklist_id = db_manager.create_checklist("Packing", "", test_user)
+        db_manager.add_checklist_items_bulk(checklist_id, ["Passport", "Socks"])
+        first = await checklist_manager.get_checklist_with_items(checklist_id)
+        passport, socks = (item.id for item in first.items)
+        checklist_manager._item_checklists.pop(passport)
+        checklist_manager._item_checklists.pop(socks)
+        
+        # Act
+        toggled = checklist_manager.toggle_item(passport, test_user)
+        after_toggle = await checklist_manager.get_checklist_with_items(checklist_id)
+        checklist_manager._item_checklists.pop(socks)
+        removed = await checklist_manager.remove_item_from_checklist(socks, test_user)
+        after_remove = await checklist_manager.get_checklist_with_items(checklist_id)
+        
+        # Assert
+        assert toggled
+        assert after_toggle.items[0].completed
+        assert removed['success']
+        assert [item.id for item in after_remove.items] == [passport]
+    
+    @pytest.mark.asyncio
+    async def test_item_checklist_id_known_after_items_load(self, checklist_manager, db_manager, test_user):
+        """Test that an item's checklist is resolved without a lookup once its items are cached."""
+        # Arrange
+        checklist_id = db_manager.create_checklist("Packing", "", test_user)
+        db_manager.add_checklist_items_bulk(checklist_id, ["Passport"])
+        checklist = await checklist_manager.get_checklist_with_items(checklist_id)
+        item_id = checklist.items[0].id
+        db_manager.get_checklist_item = None  # any database lookup would now fail
+        
+        # Act
+        resolved = await checklist_manager.get_item_checklist_id(item_id)
+        
+        # Assert
+        assert resolved == checklist_id
+
+
+class TestChecklistWritePermissions:
+    """Tests for checklist writes that carry their authorization check in SQL."""
+    
+    @pytest.mark.asyncio
+    async def test_partner_may_edit_items_but_only_creator_deletes(self, checklist_manager, db_manager, test_paired_users):
+        """Test that the shared partner can add/remove items but not delete the checklist."""
+        # Arrange
+        user1 = test_paired_users['user1']
+        user2 = test_paired_users['user2']
+        checklist_id = db_manager.create_checklist("Groceries", "", user1)
+        
+        # Act
+        added = await checklist_manager.add_item_to_checklist(checklist_id, " Milk ", user2)
+        item_id = db_manager.get_checklist_items(checklist_id)[0]['id']
+        denied = await checklist_manager.delete_checklist(checklist_id, user2)
+        removed = await checklist_manager.remove_item_from_checklist(item_id, user2)
+        missing = await checklist_manager.remove_item_from_checklist(item_id, user2)
+        deleted = await checklist_manager.delete_checklist(checklist_id, user1)
+        
+        # Assert
+        assert added['success']
+        assert denied == {'success': False, 'message': 'Only the creator can delete a checklist'}
+        assert removed['success']
+        assert missing['message'] == 'Item not found'
+        assert deleted['success']
+        assert db_manager.get_checklist_by_id(checklist_id) is None
+    
+    @pytest.mark.asyncio
+    async def test_stranger_cannot_add_items(self, checklist_manager, db_manager, test_user, test_paired_users):
+        """Test that a user the checklist is not shared with is refused."""
+        # Arrange
+        checklist_id = db_manager.create_checklist("Private", "", test_user)
+        
+        # Act
+        result = await checklist_manager.add_item_to_checklist(checklist_id, "Secret", test_paired_users['user1'])
+        
+        # Assert
+        assert result['message'] == 'You do not have permission to modify this checklist'
+        assert db_manager.get_checklist_items(checklist_id) == []
+
+
+class TestManualChecklists:
+    """Tests for checklists created from explicit item lists."""
+    
+    @pytest.mark.asyncio
+    async def test_manual_checklist_needs_a_non_blank_item(self, checklist_manager, db_manager, test_user):
+        """Test that blank items are dropped and an all-blank list creates nothing."""
+        # Arrange / Act
+        blank = await checklist_manager.create_checklist_manual("Empty", "", ["  ", ""], test_user)
+        created = await checklist_manager.create_checklist_manual("Packing", "", [" Passport ", " "], test_user)
+        
+        # Assert
+        assert blank == {'success': False, 'message': 'Checklist must have at least one item'}
+        assert created['items'] == ["Passport"]
+        assert [c['title'] for c in db_manager.get_checklists(test_user)] == ["Packing"]
@@ -1,6 +1,7 @@
 """
 Tests for LLM client appointment extraction functionality.
 """
+import asyncio
 import pytest
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
@@ -41,6 +42,7 @@ class TestLLMAppointmentExtraction:
             assert result['success'] is True
             assert result['title'] == "Dinner"
             assert 'appointment_datetime' in result
+            assert result['appointment_epoch'] == datetime(2026, 1, 29, 19, 0).timestamp()
     
     @pytest.mark.asyncio
     async def test_extract_appointment_with_location(self, llm_client):
@@ -186,6 +188,119 @@ class TestLLMAppointmentExtraction:
             # Assert
             assert result['success'] is False
             assert 'error' in result
+    
+    @pytest.mark.asyncio
+    async def test_repeated_extraction_is_served_from_cache(self, llm_client):
+        """Test that a successful extraction is reused and a failed one is retried."""
+        # Arrange
+        success_response = MagicMock()
+        success_response.text = '''{
+            "title": "Groceries",
+            "description": null,
+            "items": ["Milk", "Eggs"],
+            "success": true,
+            "error": null
+        }'''
+        mock_generate = AsyncMock(side_effect=[Exception("API Error"), success_response])
+        
+        with patch.object(llm_client.model, 'generate_content_async', new=mock_generate):
+            # Act
+            failed = await llm_client.extract_checklist_details("Groceries: milk, eggs")
+            first = await llm_client.extract_checklist_details("Groceries: milk, eggs")
+            second = await llm_client.extract_checklist_details("Groceries: milk, eggs ")
+            
+            # Assert
+            assert failed['success'] is False
+            assert first == second
+            assert mock_generate.await_count == 2
+            assert llm_client.cache_stats()['checklist']['hits'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_classify_and_extract_in_one_call(self, llm_client):
+        """Test that one request returns both the intent and the appointment details."""
+        # Arrange
+        mock_response = MagicMock()
+        mock_response.text = '''{
+            "type": "appointment",
+            "details": {
+                "title": "Dinner",
+                "date": "2026-01-29",
+                "time": "19:00",
+                "location": null,
+                "duration_minutes": 120,
+                "success": true,
+                "error": null
+            }
+        }'''
+        mock_generate = AsyncMock(return_value=mock_response)
+        
+        with patch.object(llm_client.model, 'generate_content_async', new=mock_generate):
+            # Act
+            result = await llm_client.classify_and_extract("Dinner tomorrow at 7pm")
+            
+            # Assert
+            assert mock_generate.await_count == 1
+            assert result['type'] == 'appointment'
+            assert result['details']['title'] == "Dinner"
+            assert result['details']['appointment_epoch'] == datetime(2026, 1, 29, 19, 0).timestamp()
+    
+    @pytest.mark.asyncio
+    async def test_classify_and_extract_unknown_has_no_details(self, llm_client):
+        """Test that text that is neither kind yields no details."""
+        # Arrange
+        mock_response = MagicMock()
+        mock_response.text = '{"type": "unknown", "details": null}'
+        
+        with patch.object(llm_client.model, 'generate_content_async', new=AsyncMock(return_value=mock_response)):
+            # Act
+            result = await llm_client.classify_and_extract("How are you?")
+            
+            # Assert
+            assert result == {'type': 'unknown', 'details': None}
+    
+    @pytest.mark.asyncio
+    async def test_classify_and_extract_uses_cached_intent(self, llm_client):
+        """Test that a cached intent skips the combined prompt and only extracts details."""
+        # Arrange
+        intent_response = MagicMock()
+        intent_response.text = '{"type": "checklist", "confidence": 0.9, "reason": "List"}'
+        details_response = MagicMock()
+        details_response.text = '{"title": "Groceries", "items": ["milk", "eggs"], "success": true, "error": null}'
+        mock_generate = AsyncMock(side_effect=[intent_response, details_response])
+        
+        with patch.object(llm_client.model, 'generate_content_async', new=mock_generate):
+            # Act
+            await llm_client.determine_intent("Buy milk, eggs")
+            result = await llm_client.classify_and_extract("buy milk eggs")
+            
+            # Assert
+            assert result['type'] == 'checklist'
+            assert result['details']['items'] == ["milk", "eggs"]
+            assert 'Decide whether' not in mock_generate.await_args_list[1].args[0]
+    
+    @pytest.mark.asyncio
+    async def test_classify_and_extract_seeds_semantic_cache(self):
+        """Test that the combined answer serves later paraphrases through the semantic cache."""
+        # Arrange
+        llm_client = LLMClient(api_key="test_api_key", semantic_cache=True)
+        mock_response = MagicMock()
+        mock_response.text = '{"type": "unknown", "details": null}'
+        mock_generate = AsyncMock(return_value=mock_response)
+        mock_embed = AsyncMock(side_effect=[
+            {'embedding': [1.0, 0.0, 0.1]},
+            {'embedding': [0.98, 0.02, 0.1]},
+        ])
+        
+        with patch.object(llm_client.model, 'generate_content_async', new=mock_generate), \
+             patch('src.llm_client.genai.embed_content_async', new=mock_embed):
+            # Act
+            first = await llm_client.classify_and_extract("How are you today?")
+            paraphrase = await llm_client.classify_and_extract("How are you doing today?")
+            
+            # Assert
+            assert first == paraphrase == {'type': 'unknown', 'details': None}
+            assert mock_generate.await_count == 1
+            assert llm_client.cache_stats()['semantic_intent']['hits'] == 1
 
 
 class TestLLMIntentDetermination:
@@ -258,6 +373,91 @@ class TestLLMIntentDetermination:
             # Assert
             assert result['type'] == 'unknown'
             assert result['confidence'] < 0.5
+    
+    @pytest.mark.asyncio
+    async def test_repeated_intent_is_served_from_cache(self, llm_client):
+        """Test that rephrasings differing only in case/punctuation reuse the first result."""
+        # Arrange
+        mock_response = MagicMock()
+        mock_response.text = '''{
+            "type": "appointment",
+            "confidence": 0.9,
+            "reason": "Dinner plan"
+        }'''
+        mock_generate = AsyncMock(return_value=mock_response)
+        
+        with patch.object(llm_client.model, 'generate_content_async', new=mock_generate):
+            # Act
+            first = await llm_client.determine_intent("Dinner Friday at 7pm!")
+            second = await llm_client.determine_intent("  dinner friday at 7pm ")
+            
+            # Assert
+            assert first == second
+            assert mock_generate.await_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_intents_share_one_request(self, llm_client):
+        """Test that identical prompts arriving together trigger a single API call."""
+        # Arrange
+        mock_response = MagicMock()
+        mock_response.text = '{"type": "checklist", "confidence": 0.8, "reason": "List"}'
+        
+        async def slow_generate(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return mock_response
+        
+        mock_generate = AsyncMock(side_effect=slow_generate)
+        
+        with patch.object(llm_client.model, 'generate_content_async', new=mock_generate):
+            # Act
+            results = await asyncio.gather(*(llm_client.determine_intent("Buy milk, eggs") for _ in range(5)))
+            
+            # Assert
+            assert mock_generate.await_count == 1
+            assert all(result['type'] == 'checklist' for result in results)
+            results[1]['type'] = 'changed'
+            assert results[0]['type'] == 'checklist'
+    
+    @pytest.mark.asyncio
+    async def test_paraphrased_intent_is_served_from_semantic_cache(self):
+        """Test that a near-duplicate embedding reuses the cached intent."""
+        # Arrange
+        llm_client = LLMClient(api_key="test_api_key", semantic_cache=True)
+        mock_response = MagicMock()
+        mock_response.text = '{"type": "appointment", "confidence": 0.9, "reason": "Dinner"}'
+        mock_generate = AsyncMock(return_value=mock_response)
+        mock_embed = AsyncMock(side_effect=[
+            {'embedding': [1.0, 0.0, 0.1]},
+            {'embedding': [0.98, 0.02, 0.1]},
+            {'embedding': [0.0, 1.0, 0.0]},
+        ])
+        
+        with patch.object(llm_client.model, 'generate_content_async', new=mock_generate), \
+             patch('src.llm_client.genai.embed_content_async', new=mock_embed):
+            # Act
+            first = await llm_client.determine_intent("Remind me about dinner Friday 7pm")
+            paraphrase = await llm_client.determine_intent("Set a dinner reminder Friday at 7")
+            unrelated = await llm_client.determine_intent("Buy milk and eggs")
+            
+            # Assert
+            assert paraphrase == first
+            assert unrelated['type'] == 'appointment'
+            assert mock_generate.await_count == 2
+            assert llm_client.cache_stats()['semantic_intent']['hits'] == 1
+    
+    @pytest.mark.asyncio
+    async def test_failed_intent_is_not_cached(self, llm_client):
+        """Test that API errors are retried on the next call."""
+        # Arrange
+        mock_generate = AsyncMock(side_effect=Exception("API Error"))
+        
+        with patch.object(llm_client.model, 'generate_content_async', new=mock_generate):
+            # Act
+            await llm_client.determine_intent("Buy milk")
+            await llm_client.determine_intent("Buy milk")
+            
+            # Assert
+            assert mock_generate.await_count == 2
 
 
 class TestDateTimeParsing: